@@ -3,8 +3,12 @@ import logging
 LOGGER_NAME = "GRAPHML-BUILDER"
 FORMATSTRING = "%(levelname)7s | %(message)s"
 # FORMATSTRING = "%(message)s"
-logging.basicConfig(
-    level=logging.INFO,
-    format=FORMATSTRING
-)
 logger = logging.getLogger(name=LOGGER_NAME)
+
+
+def setup_logging() -> None:
+    """Logging of the scripts (not done at import, thus the modules can be used with the caller's logging)."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=FORMATSTRING
+    )
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3.8
+
+"""
+Minimal acyclic deterministic finite automaton (DFA) of the input sentences, which accepts exactly the input
+sentences (as token sequences), unlike the one-node-per-word automaton.
+
+The DFA is built incrementally from the sorted sentences (Daciuk et al., 2000, "Incremental construction
+of minimal acyclic finite-state automata"): only the states of the path of the last sentence are open,
+the states after its common prefix with the next sentence are completed then, i.e. replaced by an equivalent
+state of the register (same finality and same transitions) or added to it. Thus the construction is linear
+in the input size, and the DFA is minimal at any time but for the open path. The sentences are sorted with
+an external merge sort if they do not fit in one run in memory (see sort_sentences()).
+
+For the output, the DFA is written as a word graph, as the other graphs (see write_graphml()).
+"""
+
+from array import array
+import heapq
+import itertools
+import os
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from paraphrase_utils import FORMAT, OUTPUT_FORMATS, iter_sentence_chunks
+from paraphrase_Vocabulary import Vocabulary
+
+
+SORT_RUN_SENTENCES = 100000  # sentences sorted in memory, more are sorted in runs on disk
+DOUBLE_FRAME = ' hasLineColor="true" lineColor="#000000"'  # of the end nodes, as in the automaton
+
+
+class MinimalDfa:
+    """
+    Minimal acyclic DFA of the sentences added in sorted order (see add_sentence()), with its own vocabulary.
+
+    The states are numbered in the order of their completion, thus the targets of the transitions of a state
+    have lower numbers than the state, and the initial state is the last one. The completed states are stored
+    one after the other in one integer array, each as [is final, word id, target, word id, target, ...]
+    (the transitions in the order of their words); the bytes of these numbers are the keys of the register.
+    """
+
+    __slots__ = ("vocabulary", "__state_numbers", "__state_offsets", "__register", "__path", "__last_sentence",
+                 "sentence_count")
+
+    def __init__(self) -> None:
+
+        self.vocabulary = Vocabulary()
+        self.__state_numbers = array("I")  # the completed states, one after the other
+        self.__state_offsets = array("Q", [0])  # start of each completed state in __state_numbers (and the end)
+        self.__register = {}  # type: Dict[bytes, int]
+        self.__path = [array("I", [0])]  # the open states of the last sentence, from the initial state
+        self.__last_sentence = None  # type: Optional[List[str]]
+        self.sentence_count = 0  # unique sentences
+
+    @classmethod
+    def from_arrays(cls, words: List[str], state_numbers: array, state_offsets: array) -> "MinimalDfa":
+        """The completed DFA with the arrays of its states (see get_arrays()) and its words."""
+
+        dfa = cls()
+        for word in words:
+            dfa.vocabulary.add(word)
+        dfa.__state_numbers = state_numbers
+        dfa.__state_offsets = state_offsets
+        dfa.__register = None
+        dfa.__path = []
+        dfa.sentence_count = dfa.get_suffix_counts()[-1]
+        return dfa
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.__path
+
+    @property
+    def state_count(self) -> int:
+        return len(self.__state_offsets) - 1 + len(self.__path)
+
+    @property
+    def transition_count(self) -> int:
+        completed_count = (len(self.__state_numbers) - len(self.__state_offsets) + 1) >> 1
+        return completed_count + sum(len(state_numbers) >> 1 for state_numbers in self.__path)
+
+    @property
+    def initial_state(self) -> int:
+        assert self.is_complete, "The DFA is not complete."
+        return len(self.__state_offsets) - 2
+
+    def add_sentence(self, tokens: List[str]) -> bool:
+        """
+        Add the (non-empty) sentence, which must not come before the previous one in the order of the token lists
+        (see sort_sentences()). Return False for a repeated sentence, which is not added again.
+        """
+
+        assert tokens, "Empty sentence."
+        assert not self.is_complete, "The DFA is complete: no sentences can be added."
+        last_sentence = self.__last_sentence
+        prefix_length = 0
+        if last_sentence is not None:
+            assert tokens >= last_sentence, f"The sentences are not sorted: {tokens} after {last_sentence}."
+            if tokens == last_sentence:
+                return False
+            for token, last_token in zip(tokens, last_sentence):
+                if token != last_token:
+                    break
+                prefix_length += 1
+        self.__complete(prefix_length)
+
+        path = self.__path
+        for token in tokens[prefix_length:]:
+            path[-1].extend((self.vocabulary.add(token), 0))  # the target is set when it is completed
+            path.append(array("I", [0]))
+        path[-1][0] = 1
+        self.__last_sentence = tokens
+        self.sentence_count += 1
+        return True
+
+    def finish(self) -> None:
+        """Complete all states; no sentences can be added later."""
+
+        self.__complete(0)
+        self.__state_numbers.extend(self.__path.pop())  # the initial state, not equivalent to another one
+        self.__state_offsets.append(len(self.__state_numbers))
+        self.__register = None
+        self.__last_sentence = None
+
+    def __complete(self, path_length: int) -> None:
+        """Replace the open states of the path after its first path_length transitions by registered ones."""
+
+        path = self.__path
+        register = self.__register
+        while len(path) > path_length + 1:
+            state_numbers = path.pop()
+            signature = state_numbers.tobytes()
+            state = register.get(signature)
+            if state is None:
+                state = register[signature] = len(self.__state_offsets) - 1
+                self.__state_numbers.extend(state_numbers)
+                self.__state_offsets.append(len(self.__state_numbers))
+            path[-1][-1] = state
+
+    def get_arrays(self) -> Tuple[array, array]:
+        """The numbers and the offsets of the states of the completed DFA (see the class)."""
+        assert self.is_complete, "The DFA is not complete."
+        return self.__state_numbers, self.__state_offsets
+
+    def get_transitions(self, state: int) -> Tuple[bool, array]:
+        """Whether the completed state is final, and its transitions: word id and target, interleaved."""
+
+        start = self.__state_offsets[state]
+        return bool(self.__state_numbers[start]), self.__state_numbers[start + 1:self.__state_offsets[state + 1]]
+
+    def get_suffix_counts(self) -> array:
+        """For each state of the completed DFA, the number of sentences from it to the end."""
+
+        suffix_counts = array("Q")
+        state_numbers = self.__state_numbers
+        state_offsets = self.__state_offsets
+        for start, end in zip(state_offsets, state_offsets[1:]):
+            suffix_counts.append(state_numbers[start]
+                                 + sum(suffix_counts[target] for target in state_numbers[start + 2:end:2]))
+        return suffix_counts
+
+    def iter_incoming_words(self) -> Iterator[Tuple[int, bool, array, Dict[int, int]]]:
+        """
+        Yield each state of the completed DFA but the initial one (in topological order, from the initial state on)
+        with its finality, its transitions (see get_transitions()) and the distinct words of its incoming transitions
+        with their numbers of paths from the initial state. Only the incoming words of the states between the visited
+        and the unvisited ones are kept in memory.
+        """
+
+        incoming_words = {}  # type: Dict[int, Dict[int, int]]
+        initial_state = self.initial_state
+        for state in range(initial_state, -1, -1):
+            is_final, transitions = self.get_transitions(state)
+            if state == initial_state:
+                path_count = 1
+            else:
+                state_incoming_words = incoming_words.pop(state)
+                yield state, is_final, transitions, state_incoming_words
+                path_count = sum(state_incoming_words.values())
+            for word_id, target in zip(transitions[0::2], transitions[1::2]):
+                target_incoming_words = incoming_words.get(target)
+                if target_incoming_words is None:
+                    incoming_words[target] = {word_id: path_count}
+                else:
+                    target_incoming_words[word_id] = target_incoming_words.get(word_id, 0) + path_count
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        return f"MinimalDfa with {self.state_count} states of {self.sentence_count} sentences"
+
+
+def sort_sentences(sentences: Iterable[List[str]], run_size: int = SORT_RUN_SENTENCES) -> Iterator[List[str]]:
+    """
+    Yield the (streamed) sentences in the order of their token lists. Up to run_size sentences are sorted in memory;
+    more sentences are sorted in runs of run_size sentences, which are written to temporary files and merged.
+    """
+
+    chunks = iter_sentence_chunks(sentences, run_size)
+    first_chunk = next(chunks, [])
+    second_chunk = next(chunks, None)
+    if second_chunk is None:
+        first_chunk.sort()
+        yield from first_chunk
+        return
+
+    import tempfile  # deferred: only needed for large inputs
+    with tempfile.TemporaryDirectory(prefix="dfa_sort_") as run_dir:
+        run_filenames = []
+        for chunk in itertools.chain((first_chunk, second_chunk), chunks):
+            chunk.sort()
+            run_filename = os.path.join(run_dir, f"run_{len(run_filenames)}.txt")
+            with open(run_filename, "w", encoding="utf-8") as f:
+                f.writelines(" ".join(tokens) + "\n" for tokens in chunk)  # the tokens have no whitespace
+            run_filenames.append(run_filename)
+        del first_chunk, second_chunk, chunk
+
+        run_files = [open(run_filename, encoding="utf-8") for run_filename in run_filenames]
+        try:
+            yield from heapq.merge(*((line.split() for line in f) for f in run_files))
+        finally:
+            for f in run_files:
+                f.close()
+
+
+def dump_minimal_dfa(dfa: MinimalDfa, f: BinaryIO) -> None:
+    """Pickle of the words and of the state arrays of the completed DFA."""
+
+    import pickle  # deferred: only needed for the build cache
+    words = [dfa.vocabulary.get_word(word_id) for word_id in range(len(dfa.vocabulary))]
+    pickle.dump((words,) + dfa.get_arrays(), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_minimal_dfa(filename: str) -> MinimalDfa:
+
+    with open(filename, "rb") as f:
+        import pickle
+        words, state_numbers, state_offsets = pickle.load(f)
+    return MinimalDfa.from_arrays(words, state_numbers, state_offsets)
+
+
+def write_graphml(dfa: MinimalDfa, config: Dict[str, Any], graphml_output_filename: str,
+                  output_file: Optional[TextIO] = None, output_format: str = "graphml") -> Tuple[int, int]:
+    """
+    The completed DFA as a word graph: each state is written once for each distinct word of its incoming
+    transitions, as a node of this word linked to the nodes of its outgoing transitions. Thus the sentences are
+    exactly the word sequences along the paths from a start node (of a transition of the initial state) to an end
+    node (of a final state); there are at most as many nodes as transitions, and every edge is a token bigram
+    of an input sentence.
+    The counts are the numbers of (unique) sentences through the nodes and edges. Return the numbers of nodes and
+    edges written. output_file, output_format: see automaton_graphml_builder.write_graphml().
+    """
+
+    suffix_counts = dfa.get_suffix_counts()
+    _, initial_transitions = dfa.get_transitions(dfa.initial_state)
+    start_nodes = set(zip(initial_transitions[1::2], initial_transitions[0::2]))  # (state, word id)
+    color_start, color_end, color_general = (config[key.value]
+                                             for key in (FORMAT.COLOR_START, FORMAT.COLOR_END, FORMAT.COLOR_GENERAL))
+    get_word = dfa.vocabulary.get_word
+    node_count = edge_count = 0
+    with OUTPUT_FORMATS[output_format](graphml_output_filename, config, output_file=output_file) as writer:
+
+        # nodes
+        for state, is_final, _, incoming_words in dfa.iter_incoming_words():
+            suffix_count = suffix_counts[state]
+            double_frame = DOUBLE_FRAME if is_final else ""
+            for word_id, path_count in incoming_words.items():
+                if (state, word_id) in start_nodes:
+                    background_color = color_start
+                else:
+                    background_color = color_end if is_final else color_general
+                writer.write_node(f"id_q{state}_w{word_id}_node", get_word(word_id), background_color, double_frame,
+                                  path_count * suffix_count)
+            node_count += len(incoming_words)
+
+        # edges
+        for state, _, transitions, incoming_words in dfa.iter_incoming_words():
+            targets = [(f"id_q{target}_w{word_id}_node", suffix_counts[target])
+                       for word_id, target in zip(transitions[0::2], transitions[1::2])]
+            for word_id, path_count in incoming_words.items():
+                node_name = f"id_q{state}_w{word_id}_node"
+                for target_node_name, suffix_count in targets:
+                    writer.write_edge(node_name, target_node_name, count=path_count * suffix_count)
+            edge_count += len(incoming_words) * len(targets)
+
+    return node_count, edge_count
@@ -5,57 +5,237 @@ This script just build a deterministic finite automaton from input sentence toke
 (Simple version.)
 
 Note that from this automaton, you cannot exactly reconstruct the original sentences.
+With --mode dfa, the minimal deterministic automaton accepting exactly the input sentences is built instead
+(see automaton_dfa.py).
 """
 
 __author__ = "Eva Mujdricza-Maydt"
 __version__ = "20200410"
 
-import logging
-import os
+import argparse
 import sys
-from typing import List, Any, Dict
+from typing import List, Any, BinaryIO, Dict, Optional, Set, TextIO, Tuple
 
-from __init__ import logger
-from paraphrase_graphml_builder import get_arguments
-from paraphrase_utils import GRAPHML, FORMAT, \
-    get_config, escape_text, read_sentences, _get_width
+from __init__ import logger, setup_logging
+from paraphrase_batch import run_batch
+from paraphrase_cache import BuildCache, get_cache_key
+from paraphrase_arguments import get_argument_parser
+from paraphrase_metrics import METRICS, MEMORY_BUDGET, MemoryBudgetExceeded, Progress
+from paraphrase_pruning import Pruning, prune_counts
+from paraphrase_utils import FORMAT, STDIN_FILENAME, OUTPUT_FORMATS, \
+    get_config, iter_sentences, iter_sentences_in_byte_range, get_byte_range_shards, get_output_filename, \
+    get_output_suffix, expand_input_filenames
 
 
+MODES = ("fsa", "dfa")
+SHARDS_PER_WORKER = 4  # more shards than workers, for balancing the load
+PROGRESS_SENTENCES = 1000  # sentences between two progress checks
 
-def build_graphml_automaton(input_filename:str, config:Dict[str, Any], end_points:bool) -> None:
+
+def get_arguments(args:List[str]) -> argparse.Namespace:
+    
+    parser = get_argument_parser(description="Automaton graph builder (graphml).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes counting the nodes and transitions of the input file "
+                             "in byte-range shards (not for the standard input); "
+                             "with several input files, the number of files built in parallel.")
+    parser.add_argument("--mode", type=str, choices=MODES, default="fsa",
+                        help="'fsa': one node per distinct token (default); 'dfa': the minimal deterministic "
+                             "automaton accepting exactly the input sentences, written as a word graph "
+                             "(see automaton_dfa.py).")
     
-    tokenized_sentences = read_sentences(input_filename, config, end_points)
-    nodes = _generate_nodes(tokenized_sentences, config)
-    edges = _generate_edges(tokenized_sentences)
+    return parser.parse_args(args[1:])  # since the zeroth arg is the script name itself
+
+
+class AutomatonCounts:
+    """
+    Occurrence counts of the unique tokens (nodes) and token bigrams (transitions) in the input sentences,
+    in the order of their first occurrence, with the tokens seen as sentence start and as sentence end.
+    """
+
+    __slots__ = ("node_counts", "edge_counts", "start_tokens", "end_tokens")
+
+    def __init__(self) -> None:
+
+        self.node_counts = {}  # type: Dict[str, int]
+        self.edge_counts = {}  # type: Dict[Tuple[str, str], int]
+        self.start_tokens = set()  # type: Set[str]
+        self.end_tokens = set()  # type: Set[str]
+
+    def add_sentence(self, tokens:List[str]) -> None:
+
+        node_counts = self.node_counts
+        edge_counts = self.edge_counts
+        for token in tokens:
+            node_counts[token] = node_counts.get(token, 0) + 1
+        for transition in zip(tokens, tokens[1:]):
+            edge_counts[transition] = edge_counts.get(transition, 0) + 1
+        if tokens:
+            self.start_tokens.add(tokens[0])
+            self.end_tokens.add(tokens[-1])
+
+    def update(self, other:"AutomatonCounts") -> None:
+        """
+        Add the counts of the other automaton. If the other one was counted on the subsequent part of the input,
+        the order of first occurrence is kept.
+        """
+
+        node_counts = self.node_counts
+        edge_counts = self.edge_counts
+        for token, count in other.node_counts.items():
+            node_counts[token] = node_counts.get(token, 0) + count
+        for transition, count in other.edge_counts.items():
+            edge_counts[transition] = edge_counts.get(transition, 0) + count
+        self.start_tokens.update(other.start_tokens)
+        self.end_tokens.update(other.end_tokens)
+
+    def pruned(self, pruning:Pruning) -> "AutomatonCounts":
+        """The counts of the kept nodes and transitions (see Pruning)."""
+
+        automaton_counts = AutomatonCounts()
+        automaton_counts.node_counts, automaton_counts.edge_counts = prune_counts(self.node_counts, self.edge_counts,
+                                                                                  pruning)
+        automaton_counts.start_tokens = {token for token in self.start_tokens if token in automaton_counts.node_counts}
+        automaton_counts.end_tokens = {token for token in self.end_tokens if token in automaton_counts.node_counts}
+        return automaton_counts
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        return f"AutomatonCounts with {len(self.node_counts)} nodes and {len(self.edge_counts)} edges"
+
+
+def build_graphml_automaton(input_filename:str, config:Dict[str, Any], end_points:bool,
+                            workers:int=1) -> AutomatonCounts:
+    """
+    The input sentences are streamed: each sentence is counted right after reading.
+    With more than one worker, the input file is split in byte-range shards which are counted in a process pool;
+    the counts of the shards are merged in the input order, thus the result is the same as with one worker.
+    """
     
-    return nodes, edges
+    if workers <= 1 or input_filename == STDIN_FILENAME:
+        automaton_counts = AutomatonCounts()
+        progress = Progress("counting", "sentences")
+        sentence_count = 0
+        for tokens in METRICS.timed(iter_sentences(input_filename, config, end_points), "read"):
+            automaton_counts.add_sentence(tokens)
+            sentence_count += 1
+            if sentence_count % PROGRESS_SENTENCES == 0:
+                progress.update(sentence_count, details=f"{len(automaton_counts.node_counts)} nodes")
+                MEMORY_BUDGET.check("count")
+        METRICS.count("sentences", sentence_count)
+        return automaton_counts
+    
+    shards = get_byte_range_shards(input_filename, workers * SHARDS_PER_WORKER)
+    shard_arguments = [(input_filename, config, end_points, start, end) for start, end in shards]
+    automaton_counts = AutomatonCounts()
+    from concurrent.futures import ProcessPoolExecutor  # deferred: slow import, only needed for the workers
+    progress = Progress("counting", "shards")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard_idx, shard_counts in enumerate(executor.map(_count_byte_range, shard_arguments)):
+            automaton_counts.update(shard_counts)
+            progress.update(shard_idx + 1, len(shard_arguments))
+            MEMORY_BUDGET.check("count")
+    
+    return automaton_counts
+
+
+def build_minimal_dfa(input_filename:str, config:Dict[str, Any], end_points:bool) -> "MinimalDfa":
+    """
+    The input sentences are streamed into the sort (see sort_sentences()), and the sorted sentences
+    into the incremental construction of the DFA; repeated sentences are counted as duplicates.
+    """
+
+    from automaton_dfa import MinimalDfa, sort_sentences  # deferred: only needed with '--mode dfa'
+
+    dfa = MinimalDfa()
+    progress = Progress("building the DFA", "sentences")
+    sentence_count = duplicate_count = 0
+    tokenized_sentences = METRICS.timed(iter_sentences(input_filename, config, end_points), "read")
+    for tokens in sort_sentences(tokenized_sentences):
+        if not dfa.add_sentence(tokens):
+            duplicate_count += 1
+        sentence_count += 1
+        if sentence_count % PROGRESS_SENTENCES == 0:
+            progress.update(sentence_count, details=f"{dfa.state_count} states")
+            MEMORY_BUDGET.check("dfa")
+    dfa.finish()
+    METRICS.count("sentences", sentence_count)
+    METRICS.count("duplicate_sentences", duplicate_count)
+    return dfa
+
+
+def save_minimal_dfa(dfa:"MinimalDfa", filename:str) -> None:
+
+    from automaton_dfa import dump_minimal_dfa  # deferred: only needed with '--mode dfa'
+
+    with open(filename, "wb") as f:
+        dump_minimal_dfa(dfa, f)
+
+
+def _count_byte_range(shard_arguments:Tuple[str, Dict[str, Any], bool, int, int]) -> AutomatonCounts:
+    """Worker: counts of the sentences in one byte range of the input file."""
+
+    input_filename, config, end_points, start, end = shard_arguments
+    automaton_counts = AutomatonCounts()
+    for tokens in iter_sentences_in_byte_range(input_filename, config, end_points, start, end):
+        automaton_counts.add_sentence(tokens)
+    return automaton_counts
+
+
+def save_automaton_counts(automaton_counts:AutomatonCounts, filename:str) -> None:
+
+    with open(filename, "wb") as f:
+        dump_automaton_counts(automaton_counts, f)
 
 
-def write_graphml(nodes, edges, graphml_output_filename: str) -> None:
-    with open(graphml_output_filename, "w") as f:
-        f.write(GRAPHML.HEADER.value)
-        f.write(os.linesep)
-        f.write(GRAPHML.GRAPHML_START.value)
-        f.write(os.linesep)
-        f.write(GRAPHML.GRAPH_START_STRF.value.format(graphml_output_filename))
-        f.write(os.linesep)
+def dump_automaton_counts(automaton_counts:AutomatonCounts, f:BinaryIO) -> None:
+    """Pickle of the plain counts (in their order) and of the sorted start and end tokens."""
+
+    import pickle  # deferred: only needed for the build cache
+    pickle.dump((automaton_counts.node_counts, automaton_counts.edge_counts,
+                 sorted(automaton_counts.start_tokens), sorted(automaton_counts.end_tokens)),
+                f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_automaton_counts(filename:str) -> AutomatonCounts:
+
+    automaton_counts = AutomatonCounts()
+    with open(filename, "rb") as f:
+        import pickle
+        node_counts, edge_counts, start_tokens, end_tokens = pickle.load(f)
+    automaton_counts.node_counts = node_counts
+    automaton_counts.edge_counts = edge_counts
+    automaton_counts.start_tokens = set(start_tokens)
+    automaton_counts.end_tokens = set(end_tokens)
+    return automaton_counts
+
+
+def write_graphml(automaton_counts:AutomatonCounts, config:Dict[str, Any], graphml_output_filename: str,
+                  output_file:Optional[TextIO]=None, output_format:str="graphml") -> None:
+    """
+    Each unique node and transition is written once, with its number of occurrences.
+    With output_file, the graph is written there (see GraphWriter); output_format: see OUTPUT_FORMATS.
+    """
+    
+    start_tokens = automaton_counts.start_tokens
+    end_tokens = automaton_counts.end_tokens
+    with OUTPUT_FORMATS[output_format](graphml_output_filename, config, output_file=output_file) as writer:
 
         # nodes
-        for node in nodes:
-            f.write(node)
-            f.write(os.linesep)
+        for token, count in automaton_counts.node_counts.items():
+            writer.write_node("id_" + writer.escape(token), token,
+                              __get_background_color(token, start_tokens, end_tokens, config),
+                              __get_double_frame(token, end_tokens),
+                              count)
 
         # edges
-        for edge in edges:
-            f.write(edge)
-            f.write(os.linesep)
+        for (token_i, token_j), count in automaton_counts.edge_counts.items():
+            writer.write_edge("id_" + writer.escape(token_i), "id_" + writer.escape(token_j), count=count)
 
-        f.write(GRAPHML.GRAPH_END.value)
-        f.write(os.linesep)
-        f.write(GRAPHML.GRAPHML_END.value)
 
-
-def __get_background_color(token:str, start_tokens, end_tokens, config:Dict[str, Any]) -> str:
+def __get_background_color(token:str, start_tokens:Set[str], end_tokens:Set[str], config:Dict[str, Any]) -> str:
 
     if token in start_tokens:
         return config[FORMAT.COLOR_START.value]
@@ -64,63 +244,50 @@ def __get_background_color(token:str, start_tokens, end_tokens, config:Dict[str,
     return config[FORMAT.COLOR_GENERAL.value]
 
 
-def __get_double_frame(token_word, end_tokens) -> str:
+def __get_double_frame(token_word:str, end_tokens:Set[str]) -> str:
     
     if token_word in end_tokens:
         return ' hasLineColor="true" lineColor="#000000"'
     return ''
 
 
-def _generate_nodes(data_tokenized:List[List[str]], config:Dict[str,Any]) -> List[str]:
-
-    nodes = []
-    start_tokens = []
-    end_tokens = []
-
-    for tokens in data_tokenized:
-        for idx, token in enumerate(tokens):
-            if idx == 0 and token not in start_tokens:
-                start_tokens.append(token)
-            if idx == len(tokens)-1 and token not in end_tokens:
-                end_tokens.append(token)
-                
-            escaped_token = escape_text(token)
-            node = GRAPHML.NODE_STRF.value.format(
-                "id_" + escaped_token,
-                str(_get_width(token, config)),
-                __get_background_color(token, start_tokens, end_tokens, config),
-                __get_double_frame(token, end_tokens),
-                escaped_token
-            )
-            nodes.append(node)
-    
-    return nodes
-    
-    
-def _generate_edges(data_tokenized):
-    edges = []
-
-    for s_id, tokens in enumerate(data_tokenized):
-        for i in range(len(tokens) - 1):
-            token_i = "id_" + escape_text(tokens[i])
-            token_j = "id_" + escape_text(tokens[i+1])
-            edge = GRAPHML.EDGE_STRF.value.format(
-                f"id_s{s_id}_f{i}_t{i+1}",
-                token_i,
-                token_j
-            )
-            edges.append(edge)
-
-    return edges
-
-
 def main():
 
+    setup_logging()
     args = get_arguments(sys.argv)
     
     config_fn = args.config
     config = get_config(config_fn)
     
+    input_filenames = expand_input_filenames(args.input_filenames, args.input_pattern)
+    assert input_filenames, f"No input files found in {args.input_filenames}."
+    if len(input_filenames) > 1:
+        results = run_batch(_build_and_write_automaton, input_filenames, args, config)
+        sys.exit(1 if any(result["error"] is not None for result in results) else 0)
+    args.input_filename = input_filenames[0]
+    
+    if args.memory_report:
+        METRICS.trace_memory()
+    if args.max_memory is not None:
+        MEMORY_BUDGET.max_bytes = args.max_memory << 20
+    try:
+        _build_and_write_automaton(args, config)
+    except MemoryBudgetExceeded as e:
+        logger.error(f"! {e} Build stopped.")
+        sys.exit(1)
+    finally:
+        if args.memory_report:
+            METRICS.log_memory_report()
+        if args.metrics is not None:
+            METRICS.write_json(args.metrics)
+            logger.info(f"Metrics written to '{args.metrics}'.")
+
+
+def _build_and_write_automaton(args:argparse.Namespace, config:Dict[str, Any]) -> None:
+
+    if args.mode == "dfa":
+        _build_and_write_minimal_dfa(args, config)
+        return
     input_fn = args.input_filename
     
     
@@ -128,16 +295,86 @@ def main():
     ep = " with additional start/end points" if end_points else ""
     logger.info(f"Reading sentences from '{input_fn}'{ep}.")
     
-    output_dir = args.output_dir if args.output_dir else os.path.dirname(os.path.realpath(input_fn))
-    os.makedirs(output_dir, exist_ok=True)
-    ep = "_we" if end_points else ""
-    output_fn = os.path.join(output_dir, os.path.splitext(os.path.basename(input_fn))[0] + ep + "_fsa.graphml")
+    output_suffix = "_fsa" + get_output_suffix(args.output_format, args.compress)
+    output_fn = get_output_filename(input_fn, args.output_dir, end_points, output_suffix)
     
-    nodes, edges = build_graphml_automaton(input_fn, config, end_points)
-    logger.info(f"Automaton graph with {len(nodes)} nodes and {len(edges)} edges built.")
-    write_graphml(nodes, edges, output_fn)
+    build_cache, cache_key, cache_filename = None, None, None
+    if args.cache_dir is not None and input_fn != STDIN_FILENAME:
+        build_cache = BuildCache(args.cache_dir, args.cache_size << 20)
+        cache_key = get_cache_key("fsa", input_fn, end_points, config)
+        cache_filename = build_cache.lookup(cache_key)
+    
+    if cache_filename is not None:
+        logger.info(f"Loading the automaton counts from the cache '{cache_filename}'.")
+        with METRICS.stage("load"):
+            automaton_counts = load_automaton_counts(cache_filename)
+    else:
+        if args.workers > 1 and input_fn == STDIN_FILENAME:
+            logger.warning("The standard input cannot be split in shards: counting with one worker.")
+        with METRICS.stage("count"):
+            automaton_counts = build_graphml_automaton(input_fn, config, end_points, args.workers)
+        if build_cache is not None:
+            with METRICS.stage("save"):
+                build_cache.store(cache_key, lambda filename: save_automaton_counts(automaton_counts, filename))
+    logger.info(f"Automaton graph with {len(automaton_counts.node_counts)} nodes "
+                f"and {len(automaton_counts.edge_counts)} edges built.")
+    pruning = Pruning.from_arguments(args)
+    if pruning.is_active:
+        with METRICS.stage("prune"):
+            automaton_counts = automaton_counts.pruned(pruning)
+        logger.info(f"Pruned to {len(automaton_counts.node_counts)} nodes "
+                    f"and {len(automaton_counts.edge_counts)} edges.")
+    METRICS.count("nodes", len(automaton_counts.node_counts))
+    METRICS.count("edges", len(automaton_counts.edge_counts))
+    with METRICS.stage("write"):
+        write_graphml(automaton_counts, config, output_fn, output_format=args.output_format)
     logger.info(f"See output in '{output_fn}'.")
 
+
+def _build_and_write_minimal_dfa(args:argparse.Namespace, config:Dict[str, Any]) -> None:
+
+    from automaton_dfa import load_minimal_dfa, write_graphml as write_dfa_graphml  # deferred: only with '--mode dfa'
+
+    input_fn = args.input_filename
+    end_points = args.end_points
+    ep = " with additional start/end points" if end_points else ""
+    logger.info(f"Reading sentences from '{input_fn}'{ep}.")
+    
+    output_suffix = "_dfa" + get_output_suffix(args.output_format, args.compress)
+    output_fn = get_output_filename(input_fn, args.output_dir, end_points, output_suffix)
+    if Pruning.from_arguments(args).is_active:
+        logger.warning("The pruning options are ignored with '--mode dfa' "
+                       "(the DFA accepts exactly the input sentences).")
+    
+    build_cache, cache_key, cache_filename = None, None, None
+    if args.cache_dir is not None and input_fn != STDIN_FILENAME:
+        build_cache = BuildCache(args.cache_dir, args.cache_size << 20)
+        cache_key = get_cache_key("dfa", input_fn, end_points, config)
+        cache_filename = build_cache.lookup(cache_key)
+    
+    if cache_filename is not None:
+        logger.info(f"Loading the DFA from the cache '{cache_filename}'.")
+        with METRICS.stage("load"):
+            dfa = load_minimal_dfa(cache_filename)
+    else:
+        if args.workers > 1:
+            logger.warning("The DFA is built with one worker.")
+        with METRICS.stage("dfa"):
+            dfa = build_minimal_dfa(input_fn, config, end_points)
+        if build_cache is not None:
+            with METRICS.stage("save"):
+                build_cache.store(cache_key, lambda filename: save_minimal_dfa(dfa, filename))
+    transition_count = dfa.transition_count
+    logger.info(f"Minimal DFA with {dfa.state_count} states and {transition_count} transitions "
+                f"of {dfa.sentence_count} unique sentences built.")
+    METRICS.count("states", dfa.state_count)
+    METRICS.count("transitions", transition_count)
+    with METRICS.stage("write"):
+        node_count, edge_count = write_dfa_graphml(dfa, config, output_fn, output_format=args.output_format)
+    METRICS.count("nodes", node_count)
+    METRICS.count("edges", edge_count)
+    logger.info(f"See output in '{output_fn}' ({node_count} nodes and {edge_count} edges).")
+
 if __name__ == "__main__":
     main()
 
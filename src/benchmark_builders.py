@@ -0,0 +1,256 @@
+#!/usr/bin/env python3.8
+
+"""
+Benchmark suite of both builders on synthetic paraphrase corpora.
+
+The corpus generator produces sentences over a vocabulary of the given size. A sentence can be a duplicate
+of an earlier sentence, and it can share a prefix and/or a suffix with earlier sentences, as paraphrases do.
+For each corpus size, each stage of the builders is timed:
+  paraphrase builder: read (read_sentences), initial graph (build_initial_graph), merge (merge engine),
+                      write (write_graphml)
+  automaton builder:  count (build_graphml_automaton, including reading), write (write_graphml)
+  minimal DFA:        dfa (build_minimal_dfa, including reading and sorting), write (automaton_dfa.write_graphml)
+Each builder runs on each corpus in its own process, which is stopped when it takes more than the time limit;
+as the merging is superlinear, the builder is then skipped for the larger sizes. The results are written as JSON
+(one object with the parameters, the environment and one record per size); the output file is written again
+after each size, thus it keeps the finished runs if the benchmark is interrupted.
+
+Usage:
+  python benchmark_builders.py [--sizes 100 1000 10000 100000] [--vocabulary 5000] [--output results.json] ...
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Dict, Iterator, List, Optional
+
+from __init__ import setup_logging
+import automaton_dfa
+import automaton_graphml_builder
+import paraphrase_graphml_builder
+from paraphrase_utils import get_config, read_sentences, write_graphml
+
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+DEFAULT_TIME_LIMIT = 600  # seconds
+
+
+def generate_corpus(sentence_number: int, vocabulary_size: int = 5000, min_length: int = 3, max_length: int = 20,
+                    prefix_rate: float = 0.3, suffix_rate: float = 0.3, duplicate_rate: float = 0.05,
+                    seed: int = 0) -> Iterator[List[str]]:
+    """
+    Yield synthetic tokenized sentences. With the probability duplicate_rate, a sentence repeats an earlier one;
+    otherwise, with the probability prefix_rate (suffix_rate), it begins (ends) with the beginning (end) of an
+    earlier sentence, and the rest is drawn from the vocabulary (frequent words are more probable).
+    """
+
+    rnd = random.Random(seed)
+    vocabulary = [f"w{word_idx}" for word_idx in range(vocabulary_size)]
+    word_weights = [1 / (word_idx + 1) for word_idx in range(vocabulary_size)]  # Zipf-like
+    sentences = []
+
+    for _ in range(sentence_number):
+        if sentences and rnd.random() < duplicate_rate:
+            sentence = list(rnd.choice(sentences))
+        else:
+            length = rnd.randint(min_length, max_length)
+            sentence = rnd.choices(vocabulary, weights=word_weights, k=length)
+            if sentences and rnd.random() < prefix_rate:
+                other_sentence = rnd.choice(sentences)
+                shared_length = rnd.randint(1, min(len(other_sentence), length))
+                sentence[:shared_length] = other_sentence[:shared_length]
+            if sentences and rnd.random() < suffix_rate:
+                other_sentence = rnd.choice(sentences)
+                shared_length = rnd.randint(1, min(len(other_sentence), length))
+                sentence[-shared_length:] = other_sentence[-shared_length:]
+        sentences.append(sentence)
+        yield sentence
+
+
+def write_corpus(sentences: Iterator[List[str]], filename: str) -> None:
+    with open(filename, "w") as f:
+        for tokens in sentences:
+            f.write(" ".join(tokens) + "\n")
+
+
+def benchmark_paraphrase_builder(input_filename: str, output_filename: str, config: Dict[str, Any],
+                                 end_points: bool, engine: str) -> Dict[str, Any]:
+
+    timings = {}
+    start = time.perf_counter()
+    sentences = read_sentences(input_filename, config, end_points)
+    timings["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    node_dict = paraphrase_graphml_builder.build_initial_graph(sentences)
+    timings["initial_graph"] = time.perf_counter() - start
+    initial_node_number = len(node_dict)
+
+    start = time.perf_counter()
+    node_dict = paraphrase_graphml_builder.MERGE_ENGINES[engine](node_dict)
+    timings["merge"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    write_graphml(node_dict, config, output_filename)
+    timings["write"] = time.perf_counter() - start
+
+    return {"seconds": timings, "initial_nodes": initial_node_number, "nodes": len(node_dict),
+            "output_bytes": os.path.getsize(output_filename)}
+
+
+def benchmark_automaton_builder(input_filename: str, output_filename: str, config: Dict[str, Any],
+                                end_points: bool) -> Dict[str, Any]:
+
+    timings = {}
+    start = time.perf_counter()
+    automaton_counts = automaton_graphml_builder.build_graphml_automaton(input_filename, config, end_points)
+    timings["count"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    automaton_graphml_builder.write_graphml(automaton_counts, config, output_filename)
+    timings["write"] = time.perf_counter() - start
+
+    return {"seconds": timings, "nodes": len(automaton_counts.node_counts),
+            "edges": len(automaton_counts.edge_counts), "output_bytes": os.path.getsize(output_filename)}
+
+
+def benchmark_minimal_dfa_builder(input_filename: str, output_filename: str, config: Dict[str, Any],
+                                  end_points: bool) -> Dict[str, Any]:
+
+    timings = {}
+    start = time.perf_counter()
+    dfa = automaton_graphml_builder.build_minimal_dfa(input_filename, config, end_points)
+    timings["dfa"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    node_number, edge_number = automaton_dfa.write_graphml(dfa, config, output_filename)
+    timings["write"] = time.perf_counter() - start
+
+    return {"seconds": timings, "states": dfa.state_count, "transitions": dfa.transition_count,
+            "nodes": node_number, "edges": edge_number, "output_bytes": os.path.getsize(output_filename)}
+
+
+def _run_benchmark(connection: Connection, builder: str, input_filename: str, output_filename: str,
+                   config: Dict[str, Any], end_points: bool, engine: str) -> None:
+    """Run the benchmark of the builder (in a process of its own) and send its record."""
+
+    if builder == "paraphrase":
+        record = benchmark_paraphrase_builder(input_filename, output_filename, config, end_points, engine)
+    elif builder == "automaton":
+        record = benchmark_automaton_builder(input_filename, output_filename, config, end_points)
+    else:
+        record = benchmark_minimal_dfa_builder(input_filename, output_filename, config, end_points)
+    connection.send(record)
+    connection.close()
+
+
+def run_benchmark(builder: str, input_filename: str, output_filename: str, config: Dict[str, Any],
+                  end_points: bool, engine: str, time_limit: float) -> Optional[Dict[str, Any]]:
+    """The record of the benchmark of the builder, or None if it was stopped after time_limit seconds."""
+
+    receiving_connection, sending_connection = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_run_benchmark, args=(sending_connection, builder, input_filename,
+                                                                   output_filename, config, end_points, engine))
+    process.start()
+    sending_connection.close()
+    try:
+        if not receiving_connection.poll(time_limit):
+            return None
+        return receiving_connection.recv()
+    except EOFError:
+        raise RuntimeError(f"The {builder} benchmark failed (exit code {process.exitcode}).") from None
+    finally:
+        receiving_connection.close()
+        process.terminate()
+        process.join()
+
+
+def write_results(results: Dict[str, Any], output_filename: str) -> None:
+    """Write the results as JSON; the file is replaced atomically."""
+
+    temporary_filename = output_filename + ".tmp"
+    with open(temporary_filename, "w") as f:
+        f.write(json.dumps(results, indent=2) + "\n")
+    os.replace(temporary_filename, output_filename)
+
+
+BUILDERS = ["paraphrase", "automaton", "dfa"]
+
+
+def get_arguments(args: List[str]) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description="Benchmark of both builders on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of sentences.")
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Vocabulary size.")
+    parser.add_argument("--min_length", type=int, default=3, help="Minimal sentence length.")
+    parser.add_argument("--max_length", type=int, default=20, help="Maximal sentence length.")
+    parser.add_argument("--prefix_rate", type=float, default=0.3,
+                        help="Rate of sentences sharing a prefix with an earlier sentence.")
+    parser.add_argument("--suffix_rate", type=float, default=0.3,
+                        help="Rate of sentences sharing a suffix with an earlier sentence.")
+    parser.add_argument("--duplicate_rate", type=float, default=0.05, help="Rate of duplicated sentences.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus generator.")
+    parser.add_argument("-e", "--end_points", action="store_true", help="Add start and end points (as '-e').")
+    parser.add_argument("--engine", type=str, choices=sorted(paraphrase_graphml_builder.MERGE_ENGINES),
+                        default="fixpoint", help="Merge engine of the paraphrase builder.")
+    parser.add_argument("-c", "--config", type=str,
+                        help="Configuration file "
+                             "(default: 'config.yaml' next to the scripts, or the built-in defaults).")
+    parser.add_argument("--time_limit", type=float, default=DEFAULT_TIME_LIMIT,
+                        help="Stop a builder after this number of seconds, and skip it for the larger sizes.")
+    parser.add_argument("--output", type=str, help="JSON output file (default: standard output).")
+
+    return parser.parse_args(args[1:])
+
+
+def main():
+
+    setup_logging()
+    args = get_arguments(sys.argv)
+    config = get_config(args.config)
+    corpus_parameters = {"vocabulary_size": args.vocabulary, "min_length": args.min_length,
+                         "max_length": args.max_length, "prefix_rate": args.prefix_rate,
+                         "suffix_rate": args.suffix_rate, "duplicate_rate": args.duplicate_rate, "seed": args.seed}
+    results = {
+        "parameters": dict(corpus_parameters, end_points=args.end_points, engine=args.engine),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "runs": [],
+    }
+
+    skipped_builders = set()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sorted(args.sizes):
+            input_filename = os.path.join(tmp_dir, f"corpus_{size}.txt")
+            write_corpus(generate_corpus(size, **corpus_parameters), input_filename)
+            run = {"sentences": size, "input_bytes": os.path.getsize(input_filename)}
+            for builder in BUILDERS:
+                if builder in skipped_builders:
+                    run[builder] = {"skipped": f"time limit of {args.time_limit} seconds exceeded"}
+                    continue
+                record = run_benchmark(builder, input_filename, os.path.join(tmp_dir, f"{builder}.graphml"),
+                                       config, args.end_points, args.engine, args.time_limit)
+                if record is None:
+                    run[builder] = {"stopped": f"time limit of {args.time_limit} seconds exceeded"}
+                    skipped_builders.add(builder)
+                else:
+                    run[builder] = record
+            results["runs"].append(run)
+            if args.output is not None:
+                write_results(results, args.output)
+            print(f"{size} sentences: " + ", ".join(f"{builder} {run[builder].get('seconds', 'skipped')}"
+                                                   for builder in BUILDERS), file=sys.stderr)
+
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
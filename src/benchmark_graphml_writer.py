@@ -0,0 +1,112 @@
+#!/usr/bin/env python3.8
+
+"""
+Benchmark of the graphml writer (paraphrase_utils.GraphmlWriter) against the former per-element writer.
+
+A synthetic paraphrase graph (unmerged, i.e. one node per token) is written with both writers;
+the outputs are checked to be identical and the writing times are reported.
+
+Usage:
+  python benchmark_graphml_writer.py [-n SENTENCES] [-l LENGTH] [-v VOCABULARY] [-r REPEAT]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict
+
+from paraphrase_Graph import Graph
+from paraphrase_graphml_builder import build_initial_graph
+from paraphrase_utils import GRAPHML, get_config, write_graphml, \
+    _get_width, _get_background_color, _get_double_frame, _get_edge_counts
+
+
+def _legacy_escape_text(token):
+    return (token.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            .replace('"', "&quot;").replace("'", "&apos;"))
+
+
+def _legacy_write_graphml(node_dict: Graph, config: Dict[str, Any], graphml_output_filename: str) -> None:
+    """
+    The writer before the GraphmlWriter: formats and writes element by element
+    (with the node and edge counts, which are written by the GraphmlWriter as well).
+    """
+
+    edge_counts = _get_edge_counts(node_dict)
+    with open(graphml_output_filename, "w") as f:
+        f.write(GRAPHML.HEADER.value + os.linesep)
+        f.write(GRAPHML.GRAPHML_START.value + os.linesep)
+        f.write(GRAPHML.GRAPH_START_STRF.value.format(graphml_output_filename) + os.linesep)
+        for node_obj in node_dict.values():
+            f.write(GRAPHML.NODE_STRF.value.format(
+                _legacy_escape_text(node_dict.get_node_name(node_obj)),
+                _get_width(node_obj.token_word, config),
+                _get_background_color(node_obj, config),
+                _get_double_frame(node_obj),
+                _legacy_escape_text(node_obj.token_word)
+            ).replace("</node>", GRAPHML.NODE_COUNT_STRF.value.format(node_obj.count) + "</node>") + os.linesep)
+        for node_id, node_obj in node_dict.items():
+            for outgoing_node_id in node_obj.outgoing_node_ids:
+                source_id = _legacy_escape_text(node_dict.get_node_name(node_obj))
+                target_id = _legacy_escape_text(node_dict.get_node_name(node_dict[outgoing_node_id]))
+                edge_count = GRAPHML.EDGE_COUNT_STRF.value.format(edge_counts.get((node_id, outgoing_node_id), 0))
+                f.write(GRAPHML.EDGE_STRF.value.format(f"id_{source_id}_{target_id}_edge", source_id, target_id)
+                        .replace("</edge>", edge_count + "</edge>") + os.linesep)
+        f.write(GRAPHML.GRAPH_END.value + os.linesep)
+        f.write(GRAPHML.GRAPHML_END.value)
+
+
+def _generate_sentences(sentence_number: int, sentence_length: int, vocabulary_size: int, config: Dict[str, Any]):
+    rnd = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(vocabulary_size)] + ["&", "<b>", "it's", '"q"']
+    for _ in range(sentence_number):
+        tokens = [rnd.choice(vocabulary) for _ in range(rnd.randint(1, sentence_length))]
+        yield [config["START_TOKEN"]] + tokens + [config["END_TOKEN"]]
+
+
+def _time(writer: Callable, graph: Graph, config: Dict[str, Any], filename: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        writer(graph, config, filename)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the graphml writer.")
+    parser.add_argument("-n", "--sentences", type=int, default=20000, help="number of sentences")
+    parser.add_argument("-l", "--length", type=int, default=20, help="maximal sentence length")
+    parser.add_argument("-v", "--vocabulary", type=int, default=2000, help="vocabulary size")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="repetitions (the best time is reported)")
+    parser.add_argument("-c", "--config_filename", type=str, default="config.yaml", help="yaml config file")
+    args = parser.parse_args()
+
+    config = get_config(args.config_filename)
+    graph = build_initial_graph(_generate_sentences(args.sentences, args.length, args.vocabulary, config))
+    edge_number = sum(len(node_obj.outgoing_node_ids) for node_obj in graph.values())
+    print(f"{len(graph)} nodes, {edge_number} edges")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # same graph id in both files
+        legacy_fn = os.path.join(tmp_dir, "legacy", "out.graphml")
+        new_fn = os.path.join(tmp_dir, "new", "out.graphml")
+        os.makedirs(os.path.dirname(legacy_fn))
+        os.makedirs(os.path.dirname(new_fn))
+
+        legacy_time = _time(_legacy_write_graphml, graph, config, legacy_fn, args.repeat)
+        new_time = _time(write_graphml, graph, config, new_fn, args.repeat)
+
+        with open(legacy_fn) as legacy_f, open(new_fn) as new_f:
+            legacy_output = legacy_f.read().replace(legacy_fn, "")
+            new_output = new_f.read().replace(new_fn, "")
+        assert legacy_output == new_output, "Different outputs of the writers!"
+
+    print(f"legacy writer: {legacy_time:.3f} s")
+    print(f"GraphmlWriter: {new_time:.3f} s ({legacy_time / new_time:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
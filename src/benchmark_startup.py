@@ -0,0 +1,101 @@
+#!/usr/bin/env python3.8
+
+"""
+Import-time budget of the builders, which are started in tight loops from shell pipelines.
+
+For each entry point module, the import time of the modules of this project is measured as the best wall time
+of a fresh interpreter importing the module, minus the best wall time of a fresh interpreter importing only the
+standard library modules which the module imports (the baseline). Both are run alternately, thus a change of the
+machine load affects both alike, and the budget does not depend on the speed of the machine and of the standard
+library imports as much as an absolute one. Besides, the modules which are only needed by some options
+(yaml, the process pool, tracemalloc, hashlib, pickle, gzip, lzma, json, glob, locale, the minimal DFA) must
+not be imported at start-up: the slow standard library modules are caught by this check, not by the budget.
+The exit code is 1 if a module exceeds the budget or imports a deferred module.
+
+Usage:
+  python benchmark_startup.py [--budget 15] [--repeat 15]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+
+ENTRY_POINT_MODULES = ["automaton_graphml_builder", "paraphrase_graphml_builder"]
+DEFERRED_MODULES = ["yaml", "concurrent.futures.process", "multiprocessing", "tracemalloc", "hashlib", "pickle",
+                    "gzip", "lzma", "json", "glob", "locale", "automaton_dfa"]
+DEFAULT_IMPORT_TIME_BUDGET = 15  # milliseconds, on top of the standard library modules imported at start-up
+
+
+def measure_start_time(code: str) -> float:
+    """Wall time (in milliseconds) of a fresh interpreter running the code in this directory."""
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def get_standard_modules(module: str) -> List[str]:
+    """The modules imported with the module which are not in this directory (i.e. of the standard library)."""
+
+    code = (f"import os, sys, {module}; print(' '.join(name for name, imported_module in list(sys.modules.items()) "
+            f"if name != '__main__' and os.path.dirname(os.path.abspath(getattr(imported_module, '__file__', None) "
+            f"or os.sep)) != os.getcwd()))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            check=True, capture_output=True, text=True).stdout
+    return output.split()
+
+
+def measure_import_time(module: str, repeat: int) -> Tuple[float, float]:
+    """
+    Best import time (in milliseconds) of the module on top of the baseline (see the module documentation),
+    and best time of the baseline.
+    """
+
+    baseline_code = "import " + ", ".join(get_standard_modules(module))
+    baseline_time = module_time = float("inf")
+    for _ in range(repeat):
+        baseline_time = min(baseline_time, measure_start_time(baseline_code))
+        module_time = min(module_time, measure_start_time(f"import {module}"))
+    return module_time - baseline_time, baseline_time
+
+
+def get_imported_deferred_modules(module: str) -> List[str]:
+
+    code = f"import sys, {module}; print(' '.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            check=True, capture_output=True, text=True).stdout
+    return output.split()
+
+
+def get_arguments(args: List[str]) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description="Import-time budget of the builders.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_IMPORT_TIME_BUDGET,
+                        help="Import-time budget of each entry point module in milliseconds.")
+    parser.add_argument("--repeat", type=int, default=15, help="Repetitions (the best time is taken).")
+
+    return parser.parse_args(args[1:])
+
+
+def main():
+
+    args = get_arguments(sys.argv)
+    is_within_budget = True
+    for module in ENTRY_POINT_MODULES:
+        import_time, baseline_time = measure_import_time(module, args.repeat)
+        deferred_modules = get_imported_deferred_modules(module)
+        is_module_within_budget = import_time <= args.budget and not deferred_modules
+        is_within_budget = is_within_budget and is_module_within_budget
+        print(f"{module}: {import_time:.1f} ms (budget {args.budget:.0f} ms, baseline {baseline_time:.1f} ms)"
+              + (f", imports the deferred modules {deferred_modules}" if deferred_modules else "")
+              + ("" if is_module_within_budget else " EXCEEDED"))
+
+    sys.exit(0 if is_within_budget else 1)
+
+
+if __name__ == "__main__":
+    main()
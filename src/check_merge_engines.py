@@ -0,0 +1,69 @@
+#!/usr/bin/env python3.8
+
+"""
+Differential check of the merge engines (paraphrase_graphml_builder.MERGE_ENGINES) against the fixpoint engine.
+
+Random corpora of unique sentences over small vocabularies (thus with many merges) are merged with each engine;
+the merges (in their order) and the merged graphs (in the checkpoint format, i.e. with the order of the neighbours)
+are checked to be identical to the ones of the fixpoint engine. The corpora failing the check are reported.
+
+Usage:
+  python check_merge_engines.py [-n CORPORA] [-s SENTENCES] [-l LENGTH] [-v VOCABULARY] [--seed SEED]
+"""
+
+import argparse
+import io
+import random
+import sys
+from typing import List
+
+from paraphrase_checkpoint import dump_graph
+from paraphrase_graphml_builder import MERGE_ENGINES, build_initial_graph
+
+
+def _generate_corpus(rnd: random.Random, max_sentence_number: int, max_length: int,
+                     max_vocabulary_size: int) -> List[List[str]]:
+    vocabulary = [f"w{i}" for i in range(rnd.randint(2, max_vocabulary_size))]
+    sentence_number = rnd.randint(2, max_sentence_number)
+    sentences = {}  # dict used as ordered set
+    for _ in range(100 * sentence_number):
+        if len(sentences) == sentence_number:
+            break
+        sentences[tuple(rnd.choice(vocabulary) for _ in range(rnd.randint(1, max_length)))] = None
+    return [list(sentence) for sentence in sentences]
+
+
+def _merge(engine: str, tokenized_sentences: List[List[str]]):
+    merge_log = []
+    node_dict = MERGE_ENGINES[engine](build_initial_graph(tokenized_sentences), merge_log)
+    graph_file = io.BytesIO()
+    dump_graph(node_dict, graph_file)
+    return merge_log, graph_file.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential check of the merge engines.")
+    parser.add_argument("-n", "--corpora", type=int, default=500, help="number of random corpora")
+    parser.add_argument("-s", "--sentences", type=int, default=25, help="maximal number of sentences per corpus")
+    parser.add_argument("-l", "--length", type=int, default=7, help="maximal sentence length")
+    parser.add_argument("-v", "--vocabulary", type=int, default=8, help="maximal vocabulary size")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus generator")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    failures = {engine: [] for engine in MERGE_ENGINES if engine != "fixpoint"}
+    for corpus_idx in range(args.corpora):
+        tokenized_sentences = _generate_corpus(rnd, args.sentences, args.length, args.vocabulary)
+        expected = _merge("fixpoint", tokenized_sentences)
+        for engine, engine_failures in failures.items():
+            if _merge(engine, tokenized_sentences) != expected:
+                engine_failures.append(corpus_idx)
+
+    for engine, engine_failures in failures.items():
+        print(f"{engine}: {args.corpora - len(engine_failures)} of {args.corpora} corpora as with fixpoint"
+              + (f", different: {engine_failures}" if engine_failures else ""))
+    sys.exit(1 if any(failures.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3.8
+
+"""
+Warm build server: builds paraphrase (prp) and automaton (fsa) graphs of small sentence sets on request,
+without the start-up costs of a builder run per sentence set.
+
+The requests and responses are JSON objects, one per line, read from the standard input and written to the
+standard output, or (with --socket) exchanged over the connections of a local Unix socket. Request:
+  {"id": 1, "sentences": ["a b c", "a x c"], "mode": "prp", "end_points": false, "engine": "fixpoint",
+   "format": "graphml", "name": "graph"}
+Only "sentences" is needed: the sentences are strings (tokenized at whitespace, as the lines of an input file)
+or lists of tokens. "mode" is "prp" (default) or "fsa"; "format" is "graphml" (default) or "binary", i.e. the
+base64 encoded checkpoint format of the paraphrase graph (see paraphrase_checkpoint.py) or the pickled
+automaton counts (see automaton_graphml_builder.py); "name" is the graph id in the graphml.
+Response: {"id": 1, "nodes": 4, "graphml": "..."} (or "binary": "..."), or {"id": 1, "error": "..."}.
+
+The config is loaded once. The requests are built by a pool of worker processes (--workers), each one
+keeping its warm vocabulary over the requests; with one worker (default), the requests are built one after
+the other in the server process. As the vocabulary would grow with each new word of the requests, it is cleared
+after a request once it has more than --max_vocabulary words (each process builds one request at a time,
+thus no graph uses it then). The responses are written as the builds finish, i.e. with several workers,
+not necessarily in the order of the requests: use the "id" for matching them.
+
+Usage:
+  python graphml_build_server.py [-c <config_fn>] [--workers N] [--max_vocabulary N] [--socket <socket_fn>]
+"""
+
+import argparse
+import base64
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import io
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from __init__ import logger, setup_logging
+import automaton_graphml_builder
+from paraphrase_checkpoint import dump_graph
+from paraphrase_graphml_builder import MERGE_ENGINES, build_initial_graph
+from paraphrase_utils import get_config, write_graphml, tokenize_lines
+from paraphrase_Vocabulary import VOCABULARY
+
+
+MODES = ("prp", "fsa")
+OUTPUT_FORMATS = ("graphml", "binary")
+DEFAULT_GRAPH_NAME = "graph"
+DEFAULT_MAX_VOCABULARY_SIZE = 1000000  # words
+
+_config = None  # type: Optional[Dict[str, Any]]  # of the process building the requests
+_max_vocabulary_size = DEFAULT_MAX_VOCABULARY_SIZE
+
+
+def build_response(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the graph of the request (see the module documentation); errors are returned in the response."""
+
+    response = {"id": request.get("id")}
+    try:
+        response.update(_build(request))
+    except Exception as e:
+        response["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if len(VOCABULARY) > _max_vocabulary_size:  # the graph of the request is not used any more
+            logger.info(f"Clearing the vocabulary of {len(VOCABULARY)} words.")
+            VOCABULARY.clear()
+    return response
+
+
+def _build(request: Dict[str, Any]) -> Dict[str, Any]:
+
+    mode = request.get("mode", "prp")
+    output_format = request.get("format", "graphml")
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}' (not in {MODES}).")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown format '{output_format}' (not in {OUTPUT_FORMATS}).")
+    sentences = _get_tokenized_sentences(request["sentences"], bool(request.get("end_points", False)))
+    name = str(request.get("name", DEFAULT_GRAPH_NAME))
+
+    if mode == "prp":
+        graph = MERGE_ENGINES[request.get("engine", "fixpoint")](build_initial_graph(sentences))
+        node_number = len(graph)
+        dump, write = dump_graph, write_graphml
+    else:
+        graph = automaton_graphml_builder.AutomatonCounts()
+        for tokens in sentences:
+            graph.add_sentence(tokens)
+        node_number = len(graph.node_counts)
+        dump, write = automaton_graphml_builder.dump_automaton_counts, automaton_graphml_builder.write_graphml
+
+    if output_format == "binary":
+        binary_output = io.BytesIO()
+        dump(graph, binary_output)
+        return {"nodes": node_number, "binary": base64.b64encode(binary_output.getvalue()).decode("ascii")}
+    graphml_output = io.StringIO()
+    write(graph, _config, name, output_file=graphml_output)
+    return {"nodes": node_number, "graphml": graphml_output.getvalue()}
+
+
+def _get_tokenized_sentences(sentences: List[Any], end_points: bool) -> List[List[str]]:
+    """The sentences (strings or token lists) as token lists, as read from an input file."""
+
+    if not isinstance(sentences, list):
+        raise ValueError("The sentences have to be a list of strings or token lists.")
+    lines = [sentence if isinstance(sentence, str) else " ".join(map(str, sentence)) for sentence in sentences]
+    return list(tokenize_lines(lines, _config, end_points))
+
+
+def _init_worker(config: Dict[str, Any], max_vocabulary_size: int = DEFAULT_MAX_VOCABULARY_SIZE) -> None:
+    global _config, _max_vocabulary_size
+    _config = config
+    _max_vocabulary_size = max_vocabulary_size
+
+
+class LineServer:
+    """Reads the request lines of a client, submits them to the executor and writes the responses."""
+
+    def __init__(self, executor: Executor) -> None:
+        self.__executor = executor
+
+    def serve(self, lines: Iterable[str], write_line: Callable[[str], None]) -> None:
+        """Serve the request lines until their end; return when all responses are written."""
+
+        write_lock = threading.Lock()
+        pending_condition = threading.Condition()
+        pending_number = 0
+
+        def write_response(response: Dict[str, Any]) -> None:
+            try:
+                with write_lock:
+                    write_line(json.dumps(response))
+            except (OSError, ValueError) as e:  # the client is gone
+                logger.warning(f"! Response {response.get('id')} not written: {e}")
+
+        def write_result(future: Future, request_id: Any) -> None:
+            nonlocal pending_number
+            try:
+                write_response(future.result())
+            except Exception as e:  # e.g. a killed worker process
+                write_response({"id": request_id, "error": f"{type(e).__name__}: {e}"})
+            finally:
+                with pending_condition:
+                    pending_number -= 1
+                    pending_condition.notify()
+
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("The request has to be a JSON object.")
+            except ValueError as e:
+                write_response({"id": None, "error": f"Invalid request: {e}"})
+                continue
+            with pending_condition:
+                pending_number += 1
+            future = self.__executor.submit(build_response, request)
+            future.add_done_callback(lambda done_future, request_id=request.get("id"):
+                                     write_result(done_future, request_id))
+
+        with pending_condition:
+            pending_condition.wait_for(lambda: pending_number == 0)
+
+
+def _serve_socket(socket_filename: str, line_server: LineServer) -> None:
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+
+        def handle(self) -> None:
+
+            def write_line(line: str) -> None:
+                self.wfile.write(line.encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+            line_server.serve((line.decode("utf-8") for line in self.rfile), write_line)
+
+    if os.path.exists(socket_filename):
+        os.remove(socket_filename)
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))  # for removing the socket file
+    with socketserver.ThreadingUnixStreamServer(socket_filename, RequestHandler) as server:
+        logger.info(f"Serving on the socket '{socket_filename}'.")
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_filename)
+
+
+def get_arguments(args: List[str]) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description="Warm build server of the paraphrase and automaton graphs.")
+    parser.add_argument("-c", "--config", type=str,
+                        help="Configuration file "
+                             "(default: 'config.yaml' next to the scripts, or the built-in defaults).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes building the requests (1: in the server process).")
+    parser.add_argument("--max_vocabulary", type=int, default=DEFAULT_MAX_VOCABULARY_SIZE,
+                        help="Clear the vocabulary of a process after a request once it has more words than this.")
+    parser.add_argument("--socket", type=str,
+                        help="Unix socket file to serve on (default: standard input and output).")
+
+    return parser.parse_args(args[1:])
+
+
+def main():
+
+    setup_logging()
+    args = get_arguments(sys.argv)
+    config = get_config(args.config)
+
+    _init_worker(config, args.max_vocabulary)
+    if args.workers <= 1:  # one thread: the builds share the vocabulary of the process without locking
+        executor = ThreadPoolExecutor(max_workers=1)
+    else:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                       initargs=(config, args.max_vocabulary))
+
+    with executor:
+        line_server = LineServer(executor)
+        if args.socket is None:
+            logger.info("Serving on the standard input and output.")
+
+            def write_line(line: str) -> None:
+                sys.stdout.write(line + "\n")
+                sys.stdout.flush()
+
+            line_server.serve(sys.stdin, write_line)
+        else:
+            try:
+                _serve_socket(args.socket, line_server)
+            except KeyboardInterrupt:
+                logger.info("Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3.8
+
+"""
+Representation of the paraphrase graph.
+
+The nodes are stored in a list and identified by their integer index in it, thus the node ids
+follow the order in which the nodes were added. Deleted (merged) nodes leave an empty slot,
+so the ids of the other nodes are stable. The neighbours of the nodes are node ids (see Node).
+The string ids for the graphml output are generated from the nodes only at writing time (get_node_name).
+
+The graph can be used like a dictionary node id -> Node (in id order).
+
+The sentences of the graph are unique: duplicate input sentences are collapsed when the graph is built
+(see build_initial_graph). The graph keeps the index of each sentence in the input and the input indices of its
+duplicates, thus the multiplicity of the sentences (get_sentence_count) weights the nodes and edges.
+"""
+
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from paraphrase_Node import Node
+from paraphrase_Token import Token
+
+
+class Graph:
+
+    def __init__(self) -> None:
+
+        self.__nodes = []  # type: List[Optional[Node]]
+        self.__size = 0
+        self.__input_sentence_idxs = array("I")  # index in the input of each sentence (of its first occurrence)
+        self.__duplicate_sentence_idxs = {}  # type: Dict[int, List[int]]  # sentence -> input indices of duplicates
+
+    def add_sentence(self, input_sentence_idx: int) -> int:
+        """Register the next sentence with its index in the input; return its sentence index in the graph."""
+        self.__input_sentence_idxs.append(input_sentence_idx)
+        return len(self.__input_sentence_idxs) - 1
+
+    def add_duplicate_sentence(self, sentence_idx: int, input_sentence_idx: int) -> None:
+        """Register a further occurrence (at the index in the input) of the sentence."""
+        self.__duplicate_sentence_idxs.setdefault(sentence_idx, []).append(input_sentence_idx)
+
+    def get_sentence_count(self, sentence_idx: int) -> int:
+        """Multiplicity of the sentence in the input."""
+        duplicate_sentence_idxs = self.__duplicate_sentence_idxs.get(sentence_idx)
+        return 1 if duplicate_sentence_idxs is None else 1 + len(duplicate_sentence_idxs)
+
+    def get_input_sentence_idxs(self, sentence_idx: int) -> List[int]:
+        """Indices in the input of all occurrences of the sentence."""
+        return [self.__input_sentence_idxs[sentence_idx]] + self.__duplicate_sentence_idxs.get(sentence_idx, [])
+
+    def get_node_name(self, node_obj: Node) -> str:
+        """String id of the node for the graphml output, after its first token (with the input sentence index)."""
+        token_positions = node_obj.token_positions
+        return f"id_s{self.__input_sentence_idxs[token_positions[0]]}_t{token_positions[1]}_node"
+
+    @property
+    def sentence_number(self) -> int:
+        """Number of (unique) sentences."""
+        return len(self.__input_sentence_idxs)
+
+    @property
+    def duplicate_sentence_idxs(self) -> Dict[int, List[int]]:
+        return self.__duplicate_sentence_idxs
+
+    def add_node(self, node_token: Token, node_id: Optional[int] = None, count: int = 1) -> int:
+        """
+        New node of the token, occurring count times in the input (see Node).
+        With node_id (not below the next id), the slots before it stay empty (e.g. when loading a graph).
+        """
+        if node_id is None:
+            node_id = len(self.__nodes)
+        assert node_id >= len(self.__nodes), f"Node id {node_id} is already used!"
+        self.__nodes.extend([None] * (node_id - len(self.__nodes)))
+        self.__nodes.append(Node(node_id, node_token, count))
+        self.__size += 1
+        return node_id
+
+    def reset_node(self, node_id: int, node_token: Token, count: int = 1) -> None:
+        """Replace the node (or the empty slot of a deleted node) with a new node of the token, without edges."""
+        if self.__nodes[node_id] is None:
+            self.__size += 1
+        self.__nodes[node_id] = Node(node_id, node_token, count)
+
+    def has_edge(self, source_node_id: int, target_node_id: int) -> bool:
+        return self[source_node_id].has_outgoing_node_id(target_node_id)
+
+    def add_edge(self, source_node_id: int, target_node_id: int) -> None:
+        assert not self.has_edge(source_node_id, target_node_id), \
+            f"Node with id = {source_node_id} is already linked to node with id = {target_node_id}!"
+        self[source_node_id].add_outgoing_node_id(target_node_id)
+        self[target_node_id].add_incoming_node_id(source_node_id)
+
+    def del_edge(self, source_node_id: int, target_node_id: int) -> None:
+        self[source_node_id].del_outgoing_node_id(target_node_id)
+        self[target_node_id].del_incoming_node_id(source_node_id)
+
+    def __getitem__(self, node_id: int) -> Node:
+        node_obj = self.__nodes[node_id] if 0 <= node_id < len(self.__nodes) else None
+        if node_obj is None:
+            raise KeyError(node_id)
+        return node_obj
+
+    def __delitem__(self, node_id: int) -> None:
+        self[node_id]  # raises KeyError for unknown nodes
+        self.__nodes[node_id] = None
+        self.__size -= 1
+
+    def __contains__(self, node_id: int) -> bool:
+        return 0 <= node_id < len(self.__nodes) and self.__nodes[node_id] is not None
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __iter__(self) -> Iterator[int]:
+        return (node_obj.node_id for node_obj in self.values())
+
+    def values(self) -> Iterator[Node]:
+        return (node_obj for node_obj in self.__nodes if node_obj is not None)
+
+    def items(self) -> Iterator[Tuple[int, Node]]:
+        return ((node_obj.node_id, node_obj) for node_obj in self.values())
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        return f"Graph with {len(self)} nodes (ids up to {len(self.__nodes) - 1})"
@@ -3,96 +3,158 @@
 """
 Representation of a node in the paraphrase graph.
 
+The node id is an integer (the index of the node in the Graph). The neighbours are kept in the order of
+linking since the word chains follow the first neighbours; the links are managed by the Graph
+(see Graph.add_edge and Graph.del_edge) which keeps both sides consistent. Most nodes have a single incoming
+and a single outgoing neighbour, thus the neighbours are stored as None (no neighbour), as the neighbour id
+(one neighbour) or as a dict used as ordered set (several neighbours): linking, unlinking and the link checks
+take constant time, and the first neighbour is the first key.
+The provenance of the node (the positions of its tokens: sentence index, token index) is kept in a compact
+integer array, and the numbers of start and end tokens and of occurrences as counters, thus highly merged
+nodes cost constant time for the start/end flags and the count, and a few bytes per token.
+The tokens added to a node point back to it (Token.node_id), for linking the nodes of the sentences.
 """
 
-from typing import List, Dict
+from array import array
+from typing import Collection, Dict, Iterator, Optional, Tuple, Union
 
 from paraphrase_Token import Token
+from paraphrase_Vocabulary import VOCABULARY
 
 
 class Node:
 
+    __slots__ = ("__node_id", "__word_id", "__token_positions", "__start_token_count", "__end_token_count",
+                 "count", "__incoming", "__outgoing")
+
     def __init__(self,
-        node_id: str,
-        node_token: Token
+        node_id: int,
+        node_token: Token,
+        count: int = 1
         ) -> None:
 
         self.__node_id = node_id
-        self.__token_word = node_token.token_word
-        self.__token_objects = [node_token]
-        self.__incoming_node_ids = []
-        self.__outgoing_node_ids = []
+        self.__word_id = node_token.word_id
+        self.__token_positions = array("I", (node_token.sentence_idx, node_token.token_idx))  # interleaved
+        self.__start_token_count = int(node_token.is_start_token)
+        self.__end_token_count = int(node_token.is_end_token)
+        self.count = count  # occurrences of the tokens in the input (sentence multiplicities included)
+        node_token.node_id = node_id
+        self.__incoming = None  # type: Union[None, int, Dict[int, None]]
+        self.__outgoing = None  # type: Union[None, int, Dict[int, None]]
 
     @property
     def node_id(self):
         return self.__node_id
 
+    @property
+    def word_id(self):
+        return self.__word_id
+
     @property
     def token_word(self):
-        return self.__token_word
+        return VOCABULARY.get_word(self.__word_id)
+
+    @property
+    def token_positions(self) -> array:
+        """Sentence index and token index of each token, interleaved (only readable)."""
+        return self.__token_positions
 
     @property
-    def token_objects(self):
-        return self.__token_objects
+    def token_count(self) -> int:
+        """Number of (unique) tokens of the node."""
+        return len(self.__token_positions) >> 1
 
     @property
-    def incoming_node_ids(self):
-        return self.__incoming_node_ids
+    def start_token_count(self) -> int:
+        return self.__start_token_count
 
     @property
-    def outgoing_node_ids(self):
-        return self.__outgoing_node_ids
+    def end_token_count(self) -> int:
+        return self.__end_token_count
 
+    @property
+    def incoming_node_ids(self) -> Collection[int]:
+        """Ids of the incoming neighbours in the order of linking (only readable)."""
+        return _get_neighbour_node_ids(self.__incoming)
+
+    @property
+    def outgoing_node_ids(self) -> Collection[int]:
+        """Ids of the outgoing neighbours in the order of linking (only readable)."""
+        return _get_neighbour_node_ids(self.__outgoing)
+
+    @property
+    def first_incoming_node_id(self) -> Optional[int]:
+        return _get_first_neighbour_node_id(self.__incoming)
+
+    @property
+    def first_outgoing_node_id(self) -> Optional[int]:
+        return _get_first_neighbour_node_id(self.__outgoing)
+
+    def has_incoming_node_id(self, node_id: int) -> bool:
+        return _has_neighbour_node_id(self.__incoming, node_id)
+
+    def has_outgoing_node_id(self, node_id: int) -> bool:
+        return _has_neighbour_node_id(self.__outgoing, node_id)
 
-    def add_token_object(self, token_object):
-        assert token_object not in self.token_objects, \
-            f"Token {token_object} is already associated with this node!"
-        return self.token_objects.append(token_object)
 
-    def del_token_object(self, token_object):
-        assert token_object in self.token_objects, \
-            f"Token {token_object} is not associated with this node!"
-        self.token_objects.remove(token_object)
+    def iter_token_positions(self) -> Iterator[Tuple[int, int]]:
+        """(sentence index, token index) of each token."""
+        positions = self.__token_positions
+        return zip(positions[0::2], positions[1::2])
+
+    def add_token(self, token_object: Token, count: int = 1) -> None:
+        """Add the token, occurring count times in the input (the multiplicity of its sentence)."""
+        assert token_object.node_id != self.node_id, \
+            f"Token {token_object} is already associated with this node!"
+        self.__token_positions.append(token_object.sentence_idx)
+        self.__token_positions.append(token_object.token_idx)
+        self.__start_token_count += token_object.is_start_token
+        self.__end_token_count += token_object.is_end_token
+        self.count += count
+        token_object.node_id = self.node_id
+
+    def merge_tokens(self, other: "Node") -> None:
+        """Add the tokens of the other node (which is merged into this one)."""
+        self.__token_positions.extend(other.token_positions)
+        self.__start_token_count += other.start_token_count
+        self.__end_token_count += other.end_token_count
+        self.count += other.count
+
+    def set_tokens(self, token_positions: array, start_token_count: int, end_token_count: int, count: int) -> None:
+        """Low-level: replace the tokens (e.g. when loading a graph)."""
+        self.__token_positions = token_positions
+        self.__start_token_count = start_token_count
+        self.__end_token_count = end_token_count
+        self.count = count
 
     def add_incoming_node_id(self, node_id):
-        assert node_id not in self.incoming_node_ids, \
-            f"Node with id = {node_id} is already linked to this node with incoming relation!"
-        return self.incoming_node_ids.append(node_id)
+        """Low-level: use Graph.add_edge, which also checks that the nodes are not linked yet."""
+        self.__incoming = _add_neighbour_node_id(self.__incoming, node_id)
 
     def del_incoming_node_id(self, node_id):
-        assert node_id in self.incoming_node_ids, \
-            f"Node with id = {node_id} is not linked to this node with incoming relation!"
-        self.incoming_node_ids.remove(node_id)
+        self.__incoming = _del_neighbour_node_id(self.__incoming, node_id)  # ValueError if not linked
 
     def add_outgoing_node_id(self, node_id):
-        assert node_id not in self.outgoing_node_ids, \
-            f"Node with id = {node_id} is already linked to this node with outgoing relation!"
-        return self.outgoing_node_ids.append(node_id)
+        """Low-level: use Graph.add_edge, which also checks that the nodes are not linked yet."""
+        self.__outgoing = _add_neighbour_node_id(self.__outgoing, node_id)
 
     def del_outgoing_node_id(self, node_id):
-        assert node_id in self.outgoing_node_ids, \
-            f"Node with id = {node_id} is not linked to this node with outgoing relation!"
-        self.outgoing_node_ids.remove(node_id)
+        self.__outgoing = _del_neighbour_node_id(self.__outgoing, node_id)  # ValueError if not linked
     
     def has_start_token(self):
-        for token_obj in self.token_objects:
-            if token_obj.is_start_token:
-                return True
-        return False
+        return self.__start_token_count > 0
     
     def has_end_token(self):
-        for token_obj in self.token_objects:
-            if token_obj.is_end_token:
-                return True
-        return False
+        return self.__end_token_count > 0
 
     def __str__(self):  # print(); usually human-readable; if not implemented --> __repr__
         return self.__repr__()
 
     def __repr__(self):  # direct representation; usually more technical
 
-        return f"{self.node_id} (W={self.token_word}; T={self.token_objects}; " \
-               f"I={self.incoming_node_ids}; O={self.outgoing_node_ids}"
+        return f"{self.node_id} (W={self.token_word}; T={list(self.iter_token_positions())}; C={self.count}; " \
+               f"I={list(self.incoming_node_ids)}; O={list(self.outgoing_node_ids)}"
 
 
     def __eq__(self, other):
@@ -103,9 +165,50 @@ class Node:
         if not isinstance(other, type(self)):  # isinstance is including base classes
             return False
 
-        return (self.node_id, self.token_word) \
-               != (other.node_id, other.token_word)
+        return (self.node_id, self.word_id) \
+               == (other.node_id, other.word_id)
 
     def __hash__(self):
-        return hash(type(self), self.node_id, self.token_word)
-    
+        return hash((self.node_id, self.word_id))
+
+
+# the neighbours of a node: None, the id of the single neighbour, or a dict used as ordered set of the ids
+
+def _get_neighbour_node_ids(neighbours) -> Collection[int]:
+    if neighbours is None:
+        return ()
+    if type(neighbours) is int:
+        return (neighbours,)
+    return neighbours.keys()
+
+
+def _get_first_neighbour_node_id(neighbours) -> Optional[int]:
+    if neighbours is None or type(neighbours) is int:
+        return neighbours
+    return next(iter(neighbours))
+
+
+def _has_neighbour_node_id(neighbours, node_id: int) -> bool:
+    if type(neighbours) is int:
+        return neighbours == node_id
+    return neighbours is not None and node_id in neighbours
+
+
+def _add_neighbour_node_id(neighbours, node_id: int):
+    if neighbours is None:
+        return node_id
+    if type(neighbours) is int:
+        return {neighbours: None, node_id: None}
+    neighbours[node_id] = None
+    return neighbours
+
+
+def _del_neighbour_node_id(neighbours, node_id: int):
+    if type(neighbours) is int and neighbours == node_id:
+        return None
+    if neighbours is None or type(neighbours) is int or node_id not in neighbours:
+        raise ValueError(f"Node {node_id} is not a neighbour.")
+    del neighbours[node_id]
+    if len(neighbours) == 1:
+        return next(iter(neighbours))
+    return neighbours
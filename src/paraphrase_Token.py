@@ -3,13 +3,18 @@
 """
 Representation of a token in a sentence.
 
-
+The token word is kept as an id in the shared vocabulary (see paraphrase_Vocabulary.py).
 """
 
 from typing import List, Dict
 
+from paraphrase_Vocabulary import VOCABULARY
+
+
 class Token:
 
+    __slots__ = ("__sentence_idx", "__token_idx", "__word_id", "__is_start_token", "__is_end_token", "__node_id")
+
     def __init__(self,
         sentence_idx: int,
         token_idx: int,
@@ -19,7 +24,7 @@ class Token:
 
         self.__sentence_idx = sentence_idx
         self.__token_idx = token_idx
-        self.__token_word = token_word
+        self.__word_id = VOCABULARY.add(token_word)
         self.__is_start_token = is_start_token
         self.__is_end_token = is_end_token
 
@@ -29,13 +34,11 @@ class Token:
     
     @property
     def node_id(self):
-        """Id of the node."""
+        """Id of the node the token is associated with (changes when the node is merged into another one)."""
         return self.__node_id
     
     @node_id.setter
     def node_id(self, node_id):
-        if self.__node_id is not None:
-            raise ValueError
         self.__node_id = node_id
 
     @property
@@ -48,10 +51,15 @@ class Token:
         """Token index within the sentence (only readable)"""
         return self.__token_idx
 
+    @property
+    def word_id(self):
+        """Id of the token word in the vocabulary (only readable)"""
+        return self.__word_id
+
     @property
     def token_word(self):
         """Token (only readable)"""
-        return self.__token_word
+        return VOCABULARY.get_word(self.__word_id)
 
     @property
     def is_start_token(self):
@@ -83,7 +91,7 @@ class Token:
             return False
 
         return (self.sentence_idx, self.token_idx) \
-               != (other.sentence_idx, other.token_idx)
+               == (other.sentence_idx, other.token_idx)
 
     def __hash__(self):
-        return hash(type(self), self.sentence_idx, self.token_idx)
+        return hash((self.sentence_idx, self.token_idx))
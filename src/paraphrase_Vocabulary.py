@@ -0,0 +1,56 @@
+#!/usr/bin/env python3.8
+
+"""
+Vocabulary of the token words.
+
+Each distinct token word is stored only once and identified by an integer id; tokens and nodes keep
+only the id. The module level VOCABULARY is shared by all tokens (and graphs) built in the process;
+it can only be cleared when none of them is used any more (see the build server and the batch mode).
+"""
+
+from typing import Dict, List, Optional
+
+
+class Vocabulary:
+
+    __slots__ = ("__word_ids", "__words")
+
+    def __init__(self) -> None:
+
+        self.__word_ids = {}  # type: Dict[str, int]
+        self.__words = []  # type: List[str]
+
+    def add(self, word: str) -> int:
+        """Return the id of the word, adding it to the vocabulary if needed."""
+        word_id = self.__word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.__words)
+            self.__word_ids[word] = word_id
+            self.__words.append(word)
+        return word_id
+
+    def clear(self) -> None:
+        """Remove all words: the ids of the existing tokens and nodes become invalid."""
+        self.__word_ids.clear()
+        self.__words.clear()
+
+    def get_word_id(self, word: str) -> Optional[int]:
+        return self.__word_ids.get(word)
+
+    def get_word(self, word_id: int) -> str:
+        return self.__words[word_id]
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.__word_ids
+
+    def __len__(self) -> int:
+        return len(self.__words)
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        return f"Vocabulary with {len(self)} words"
+
+
+VOCABULARY = Vocabulary()
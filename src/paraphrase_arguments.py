@@ -0,0 +1,69 @@
+#!/usr/bin/env python3.8
+
+"""
+Command line arguments shared by the builders (kept apart from the builders, thus a builder does not import
+the other one for its arguments).
+"""
+
+import argparse
+
+from paraphrase_cache import DEFAULT_CACHE_SIZE
+from paraphrase_utils import COMPRESSIONS, DEFAULT_INPUT_PATTERN, OUTPUT_FORMATS
+
+
+def get_argument_parser(description:str="Paraphrase graph builder (graphml).") -> argparse.ArgumentParser:
+    """
+    Arguments shared by the builders. The options are spelled with underscores, the hyphenated spelling of the
+    multi-word options is accepted as well (e.g. '--max-memory' for '--max_memory').
+    """
+    
+    parser = argparse.ArgumentParser(description=description, fromfile_prefix_chars="@")
+    parser.add_argument("input_filenames", type=str, nargs="+", metavar="input_filename",
+                        help="Input filename with one tokenized sentence per line ('-' for the standard input). "
+                             "Directories (see --input_pattern) and glob patterns are expanded, '@<list_fn>' "
+                             "reads the arguments from a file (one per line). "
+                             "Several input files are built in a batch, see --workers.")
+    parser.add_argument("--input_pattern", type=str, default=DEFAULT_INPUT_PATTERN,
+                        help="Pattern of the input files in the input directories.")
+    parser.add_argument("-o", "--output_dir", type=str,
+                        help="Output directory for the output graphml file. "
+                             "If not set, the graphml will be written in the folder of the input file.")
+    parser.add_argument("--output_format", type=str, choices=list(OUTPUT_FORMATS), default="graphml",
+                        help="Output format: 'graphml' with the yEd styling of each element (default), "
+                             "'lean' graphml with numeric ids and the styling as key defaults, "
+                             "'json' or 'dot' (Graphviz).")
+    parser.add_argument("--compress", type=str, choices=COMPRESSIONS,
+                        help="Compress the output while writing it (gzip or xz), e.g. to '<name>.graphml.gz'.")
+    parser.add_argument("-c", "--config", type=str, dest="config",
+                        help="Configuration file (default: 'config.yaml' next to the scripts, "
+                             "or the built-in defaults if it is absent).")
+    parser.add_argument("-e", "--end_points", action="store_true",
+                        help="If set, additional 'start' and 'end' nodes will be added to the graph "
+                             "which connect all first and last tokens in the sequences. "
+                             "Thus, the output graph is garanteed to be connected.")
+    parser.add_argument("--min_node_count", "--min-node-count", type=int, default=1,
+                        help="Pruning: drop the words occurring less often (see paraphrase_pruning.py).")
+    parser.add_argument("--min_edge_count", "--min-edge-count", type=int, default=1,
+                        help="Pruning: drop the transitions (token bigrams) occurring less often.")
+    parser.add_argument("--top_k_nodes", "--top-k-nodes", type=int,
+                        help="Pruning: keep only this number of the most frequent words.")
+    parser.add_argument("--neighbourhood", type=str, action="append", metavar="WORD",
+                        help="Pruning: keep only the words within the neighbourhood radius of the word "
+                             "(can be repeated).")
+    parser.add_argument("--neighbourhood_radius", "--neighbourhood-radius", type=int, default=1,
+                        help="Number of transitions (in either direction) around the neighbourhood words.")
+    parser.add_argument("--cache_dir", type=str,
+                        help="Directory of the build cache: the built graph of the same input file content, "
+                             "'-e' flag and start/end tokens is taken from there (not for the standard input).")
+    parser.add_argument("--cache_size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Maximal size of the build cache in MB (the least recently used graphs are evicted).")
+    parser.add_argument("--metrics", type=str,
+                        help="JSON output file of the wall time of the build stages and of the build counters.")
+    parser.add_argument("--memory_report", "--memory-report", action="store_true",
+                        help="Trace the memory allocations (slow): log the memory of the build stages and the top "
+                             "allocation sites (and add them to the metrics).")
+    parser.add_argument("--max_memory", "--max-memory", type=int,
+                        help="Memory budget in MB: the build is stopped cleanly when the process uses more "
+                             "(the paraphrase merging is saved to the checkpoint file first, if given).")
+    
+    return parser
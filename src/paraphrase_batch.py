@@ -0,0 +1,77 @@
+#!/usr/bin/env python3.8
+
+"""
+Batch mode of the builders: many input files in one run, built by a process pool.
+
+The config is loaded once by the main process. Each input file is built as by a single run of the builder
+(with the same output filename); a failing file is logged and reported in the summary at the end,
+the other files of the batch are built nevertheless. The vocabulary of the token words is cleared after each file,
+thus it does not grow over the batch (in the main process or in a worker).
+"""
+
+import argparse
+from typing import Any, Callable, Dict, List, Tuple
+
+from __init__ import logger, setup_logging
+from paraphrase_metrics import METRICS, MEMORY_BUDGET
+from paraphrase_Vocabulary import VOCABULARY
+
+
+BuildFunction = Callable[[argparse.Namespace, Dict[str, Any]], None]
+
+
+def run_batch(build: BuildFunction, input_filenames: List[str], args: argparse.Namespace,
+              config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Build each input file with build(args, config), args.input_filename being the input file;
+    with args.workers > 1, the files are built in parallel by this number of processes (one worker per file).
+    Return one record per input file (in their order): the error (None if built) and the metrics
+    (written to args.metrics, if given).
+    """
+
+    batch_arguments = [(build, argparse.Namespace(**dict(vars(args), input_filename=input_filename, workers=1)),
+                        config)
+                       for input_filename in input_filenames]
+    logger.info(f"Building {len(input_filenames)} input files with {max(args.workers, 1)} workers.")
+
+    if args.workers <= 1:
+        results = [_build_input_file(batch_argument) for batch_argument in batch_arguments]
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # deferred: slow import, only needed for the workers
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            results = list(executor.map(_build_input_file, batch_arguments))
+
+    failed_results = [result for result in results if result["error"] is not None]
+    logger.info(f"Batch of {len(results)} input files: {len(results) - len(failed_results)} built, "
+                f"{len(failed_results)} failed.")
+    for result in failed_results:
+        logger.error(f"! '{result['input_filename']}': {result['error']}")
+    if args.metrics is not None:
+        import json  # deferred: only needed for the metrics file
+        with open(args.metrics, "w") as f:
+            json.dump({"files": results}, f, indent=2)
+            f.write("\n")
+        logger.info(f"Metrics written to '{args.metrics}'.")
+    return results
+
+
+def _build_input_file(batch_argument: Tuple[BuildFunction, argparse.Namespace, Dict[str, Any]]) -> Dict[str, Any]:
+    """Worker: build one input file, with the metrics of this file only."""
+
+    build, args, config = batch_argument
+    setup_logging()  # for worker processes which are not forked
+    METRICS.reset()
+    if args.memory_report and not METRICS.is_tracing_memory:
+        METRICS.trace_memory()
+    if args.max_memory is not None:
+        MEMORY_BUDGET.max_bytes = args.max_memory << 20
+
+    error = None
+    try:
+        build(args, config)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        logger.error(f"! Building '{args.input_filename}' failed: {error}")
+    finally:
+        VOCABULARY.clear()  # the graph of the file is not used any more
+    return dict(input_filename=args.input_filename, error=error, **METRICS.to_dict())
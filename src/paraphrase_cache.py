@@ -0,0 +1,89 @@
+#!/usr/bin/env python3.8
+
+"""
+On-disk cache of the built graphs, addressed by the content of the build inputs.
+
+The key of a build is a hash of the input file content, the '-e' flag, the config values used for building
+(the start and end token; the colors etc. only matter for writing the graphml) and further build options
+(e.g. the merge engine). The cache is bounded in size: the least recently used entries are evicted.
+"""
+
+import os
+from typing import Any, Callable, Dict, Optional
+
+from __init__ import logger
+from paraphrase_utils import FORMAT
+
+
+CACHE_FORMAT_VERSION = "2"  # change it when the cached data changes
+HASH_BLOCK_SIZE = 1 << 20
+DEFAULT_CACHE_SIZE = 1024  # MB
+
+
+def get_cache_key(kind: str, input_filename: str, end_points: bool, config: Dict[str, Any], *options: str) -> str:
+    """Hash of the build inputs; kind distinguishes the builders (and the format of the cached data)."""
+
+    import hashlib  # deferred: slow import (openssl), only needed with a cache
+    key_hash = hashlib.sha256()
+    for part in (CACHE_FORMAT_VERSION, kind, str(end_points),
+                 config[FORMAT.START_TOKEN.value], config[FORMAT.END_TOKEN.value]) + options:
+        key_hash.update(part.encode("utf-8") + b"\0")
+    with open(input_filename, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            key_hash.update(block)
+    return key_hash.hexdigest()
+
+
+class BuildCache:
+    """
+    Cache directory with one file per key. The modification time of the files is the time of their last use,
+    which is the order of the eviction.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_CACHE_SIZE << 20) -> None:
+
+        self.__cache_dir = cache_dir
+        self.__max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_filename(self, key: str) -> str:
+        return os.path.join(self.__cache_dir, key)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Filename of the cached entry (marked as used), or None if not cached."""
+
+        filename = self.get_filename(key)
+        try:
+            os.utime(filename)
+        except FileNotFoundError:
+            return None
+        return filename
+
+    def store(self, key: str, save: Callable[[str], None]) -> None:
+        """Save the entry with save(filename), then evict the least recently used entries above the size limit."""
+
+        filename = self.get_filename(key)
+        temporary_filename = f"{filename}.{os.getpid()}.tmp"
+        save(temporary_filename)
+        os.replace(temporary_filename, filename)
+        self.evict(keep=filename)
+
+    def evict(self, keep: Optional[str] = None) -> None:
+
+        entries = []
+        for entry in os.scandir(self.__cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        cache_size = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if cache_size <= self.__max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # evicted by another process
+                pass
+            cache_size -= size
+            logger.info(f"- cache entry '{path}' evicted")
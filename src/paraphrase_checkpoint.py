@@ -0,0 +1,164 @@
+#!/usr/bin/env python3.8
+
+"""
+Binary checkpoint format of the (merged or partly merged) paraphrase graph, and its loader.
+
+The file contains the integer node ids, the vocabulary table of the graph, the token words as vocabulary ids,
+the adjacency lists (in their order, since the word chains follow the first neighbours), the token provenance
+(sentence and token index; the start/end tokens and the occurrences are counted per node), the worklist
+of the merging, i.e. the nodes still to check (empty for a completely merged graph), and the input indices
+of the (unique) sentences and of their duplicates. All numbers are stored as little-endian arrays:
+
+  magic, version
+  counts: nodes, words, tokens, incoming links, outgoing links, worklist nodes, sentences, duplicates
+  vocabulary: word lengths (in bytes), utf-8 words
+  nodes: node ids, word ids, token counts, start token counts, end token counts, occurrence counts,
+         incoming counts, outgoing counts
+  tokens: sentence indices and token indices, interleaved (as in Node.token_positions)
+  adjacency: incoming node ids, outgoing node ids
+  worklist: node ids
+  sentences: input sentence indices
+  duplicates: sentence indices, input sentence indices
+"""
+
+from array import array
+import os
+import struct
+import sys
+from typing import BinaryIO, Iterable, List, Tuple
+
+from paraphrase_Graph import Graph
+from paraphrase_Token import Token
+
+
+CHECKPOINT_MAGIC = b"PRPGRAPH"
+CHECKPOINT_VERSION = 3
+COUNTS_FORMAT = "<8Q"
+
+
+def save_graph(node_dict: Graph, checkpoint_filename: str, worklist: Iterable[int] = ()) -> None:
+    """Save the graph (and the worklist of the merging); the file is replaced atomically."""
+
+    temporary_filename = checkpoint_filename + ".tmp"
+    with open(temporary_filename, "wb") as f:
+        dump_graph(node_dict, f, worklist)
+    os.replace(temporary_filename, checkpoint_filename)
+
+
+def dump_graph(node_dict: Graph, f: BinaryIO, worklist: Iterable[int] = ()) -> None:
+    """Write the graph (and the worklist of the merging) in the checkpoint format to the binary file."""
+
+    word_ids = {}  # word id in the vocabulary -> word id in the file
+    words = []
+    node_ids, node_word_ids, token_counts, start_token_counts, end_token_counts, occurrence_counts, \
+        incoming_counts, outgoing_counts = (array("I") for _ in range(8))
+    token_positions, incoming_node_ids, outgoing_node_ids = (array("I") for _ in range(3))
+
+    for node_id, node_obj in node_dict.items():
+        word_id = word_ids.get(node_obj.word_id)
+        if word_id is None:
+            word_id = word_ids[node_obj.word_id] = len(words)
+            words.append(node_obj.token_word.encode("utf-8"))
+        node_ids.append(node_id)
+        node_word_ids.append(word_id)
+        token_counts.append(node_obj.token_count)
+        start_token_counts.append(node_obj.start_token_count)
+        end_token_counts.append(node_obj.end_token_count)
+        occurrence_counts.append(node_obj.count)
+        incoming_counts.append(len(node_obj.incoming_node_ids))
+        outgoing_counts.append(len(node_obj.outgoing_node_ids))
+        token_positions.extend(node_obj.token_positions)
+        incoming_node_ids.extend(node_obj.incoming_node_ids)
+        outgoing_node_ids.extend(node_obj.outgoing_node_ids)
+    worklist = array("I", sorted(node_id for node_id in set(worklist) if node_id in node_dict))
+    word_lengths = array("I", (len(word) for word in words))
+    input_sentence_idxs = array("I", (node_dict.get_input_sentence_idxs(sent_idx)[0]
+                                      for sent_idx in range(node_dict.sentence_number)))
+    duplicate_sentence_idxs, duplicate_input_sentence_idxs = array("I"), array("I")
+    for sent_idx, input_sent_idxs in sorted(node_dict.duplicate_sentence_idxs.items()):
+        duplicate_sentence_idxs.extend([sent_idx] * len(input_sent_idxs))
+        duplicate_input_sentence_idxs.extend(input_sent_idxs)
+
+    f.write(CHECKPOINT_MAGIC + struct.pack("<I", CHECKPOINT_VERSION))
+    f.write(struct.pack(COUNTS_FORMAT, len(node_ids), len(words), len(token_positions) >> 1,
+                        len(incoming_node_ids), len(outgoing_node_ids), len(worklist),
+                        len(input_sentence_idxs), len(duplicate_sentence_idxs)))
+    _write_array(f, word_lengths)
+    f.write(b"".join(words))
+    for numbers in (node_ids, node_word_ids, token_counts, start_token_counts, end_token_counts, occurrence_counts,
+                    incoming_counts, outgoing_counts, token_positions, incoming_node_ids, outgoing_node_ids, worklist,
+                    input_sentence_idxs, duplicate_sentence_idxs, duplicate_input_sentence_idxs):
+        _write_array(f, numbers)
+
+
+def load_graph(checkpoint_filename: str) -> Tuple[Graph, List[int]]:
+    """Load the graph and the worklist of the merging (see save_graph)."""
+
+    with open(checkpoint_filename, "rb") as f:
+        magic = f.read(len(CHECKPOINT_MAGIC))
+        if magic != CHECKPOINT_MAGIC:
+            raise ValueError(f"'{checkpoint_filename}' is not a graph checkpoint file.")
+        version, = struct.unpack("<I", f.read(4))
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported version {version} of the graph checkpoint file '{checkpoint_filename}'.")
+        node_count, word_count, token_count, incoming_count, outgoing_count, worklist_count, sentence_count, \
+            duplicate_count = struct.unpack(COUNTS_FORMAT, f.read(struct.calcsize(COUNTS_FORMAT)))
+
+        word_lengths = _read_array(f, "I", word_count)
+        word_bytes = f.read(sum(word_lengths))
+        words = []
+        position = 0
+        for word_length in word_lengths:
+            words.append(word_bytes[position:position + word_length].decode("utf-8"))
+            position += word_length
+
+        node_ids, node_word_ids, token_counts, start_token_counts, end_token_counts, occurrence_counts, \
+            incoming_counts, outgoing_counts = (_read_array(f, "I", node_count) for _ in range(8))
+        token_positions = _read_array(f, "I", 2 * token_count)
+        incoming_node_ids = _read_array(f, "I", incoming_count)
+        outgoing_node_ids = _read_array(f, "I", outgoing_count)
+        worklist = _read_array(f, "I", worklist_count).tolist()
+        input_sentence_idxs = _read_array(f, "I", sentence_count)
+        duplicate_sentence_idxs, duplicate_input_sentence_idxs = \
+            (_read_array(f, "I", duplicate_count) for _ in range(2))
+
+    node_dict = Graph()
+    for input_sent_idx in input_sentence_idxs:
+        node_dict.add_sentence(input_sent_idx)
+    for sent_idx, input_sent_idx in zip(duplicate_sentence_idxs, duplicate_input_sentence_idxs):
+        node_dict.add_duplicate_sentence(sent_idx, input_sent_idx)
+    token_position = incoming_position = outgoing_position = 0
+    for node_idx, (node_id, word_id, token_count, incoming_count, outgoing_count) in \
+            enumerate(zip(node_ids, node_word_ids, token_counts, incoming_counts, outgoing_counts)):
+        positions = token_positions[2 * token_position:2 * (token_position + token_count)]
+        token_position += token_count
+        node_obj = node_dict[node_dict.add_node(Token(positions[0], positions[1], words[word_id], False, False),
+                                                node_id)]
+        node_obj.set_tokens(positions, start_token_counts[node_idx], end_token_counts[node_idx],
+                            occurrence_counts[node_idx])
+        # the order of the neighbours is kept, thus the links are restored on both sides separately
+        for incoming_node_id in incoming_node_ids[incoming_position:incoming_position + incoming_count]:
+            node_obj.add_incoming_node_id(incoming_node_id)
+        incoming_position += incoming_count
+        for outgoing_node_id in outgoing_node_ids[outgoing_position:outgoing_position + outgoing_count]:
+            node_obj.add_outgoing_node_id(outgoing_node_id)
+        outgoing_position += outgoing_count
+
+    return node_dict, worklist
+
+
+def _write_array(f: BinaryIO, numbers: array) -> None:
+    if sys.byteorder != "little":
+        numbers = array(numbers.typecode, numbers)
+        numbers.byteswap()
+    f.write(numbers.tobytes())
+
+
+def _read_array(f: BinaryIO, typecode: str, length: int) -> array:
+    numbers = array(typecode)
+    numbers.frombytes(f.read(length * numbers.itemsize))
+    if len(numbers) != length:
+        raise ValueError("Truncated graph checkpoint file.")
+    if sys.byteorder != "little":
+        numbers.byteswap()
+    return numbers
@@ -93,41 +93,59 @@ second idea:
     update nodes
 
 """
-from __init__ import logger
+from __init__ import logger, setup_logging
+from array import array
 import argparse
-import logging
-from typing import List, Tuple, Dict
+from typing import Any, List, Tuple, Dict, Iterable, Iterator, Optional, Set
+import heapq
+from collections import deque
 import sys
-import os
+import time
 
 from paraphrase_Token import Token
 from paraphrase_Node import Node
-from paraphrase_utils import GRAPHML, FORMAT, get_config, write_graphml, read_sentences
-
+from paraphrase_Graph import Graph
+from paraphrase_Vocabulary import VOCABULARY
+from paraphrase_checkpoint import save_graph, load_graph
+from paraphrase_arguments import get_argument_parser
+from paraphrase_cache import BuildCache, get_cache_key
+from paraphrase_batch import run_batch
+from paraphrase_metrics import METRICS, MEMORY_BUDGET, MemoryBudgetExceeded, Progress
+from paraphrase_pruning import Pruning, count_words, prune_counts, prune_sentences
+from paraphrase_utils import STDIN_FILENAME, get_config, write_graphml, iter_sentences, \
+    iter_sentence_chunks, get_output_filename, get_output_suffix, expand_input_filenames
+
+DIRECTIONS = ("incoming", "outgoing")
+SENTENCE_CHUNK_SIZE = 10000
+CHECKPOINT_INTERVAL = 600  # seconds
+GROUP_BATCHES_PER_WORKER = 4  # more batches than workers, for balancing the load
 
 def get_arguments(args:List[str]) -> argparse.Namespace:
     
-    parser = argparse.ArgumentParser(description="Paraphrase graph builder (graphml).")
-    parser.add_argument("input_filename", type=str,
-                        help="Input filename with one tokenized sentence per line.")
-    parser.add_argument("-o", "--output_dir", type=str,
-                        help="Output directory for the output graphml file. "
-                             "If not set, the graphml will be written in the folder of the input file.")
-    parser.add_argument("-c", "--config", type=str,
-                        default=os.path.join(os.path.dirname(__file__), "config.yaml"), dest="config",
-                        help="Configuration file.")
-    parser.add_argument("-e", "--end_points", action="store_true",
-                        help="If set, additional 'start' and 'end' nodes will be added to the graph "
-                             "which connect all first and last tokens in the sequences. "
-                             "Thus, the output graph is garanteed to be connected.")
+    parser = get_argument_parser()
+    parser.add_argument("--engine", type=str, choices=sorted(MERGE_ENGINES), default="fixpoint",
+                        help="Merge algorithm: 'fixpoint' merges node by node until nothing changes, "
+                             "'signature' is the same with the current node checked again at once after a merge.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes merging the independent sentence groups "
+                             "(sentences sharing no first or last word with each other); "
+                             "with several input files, the number of files built in parallel.")
+    parser.add_argument("--checkpoint", type=str,
+                        help="Binary graph file: saved periodically during the merging (with one worker) "
+                             "and with the final paraphrase graph at the end.")
+    parser.add_argument("--checkpoint_interval", type=float, default=CHECKPOINT_INTERVAL,
+                        help="Seconds between two checkpoints during the merging.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the graph in the checkpoint file instead of reading the input "
+                             "(the input filename is only used for naming the output).")
     
     return parser.parse_args(args[1:])  # since the zeroth arg is the script name itself
 
 
-def _generate_tokens(tokenized_sentences: List[List[str]]) -> Dict[int, Dict[int, Token]]:
+def _generate_tokens(tokenized_sentences: List[List[str]], first_sent_idx:int=0) -> Dict[int, Dict[int, Token]]:
 
     token_object_dict = {}
-    for sent_idx, tokens in enumerate(tokenized_sentences):
+    for sent_idx, tokens in enumerate(tokenized_sentences, start=first_sent_idx):
         sent_len = len(tokens)
         token_object_dict[sent_idx] = {}
         for tok_idx, token in enumerate(tokens):
@@ -139,33 +157,27 @@ def _generate_tokens(tokenized_sentences: List[List[str]]) -> Dict[int, Dict[int
     return token_object_dict
 
 
-def _generate_nodes(tokens: Dict[int, Dict[int, Token]]) -> List[Node]:
+def _generate_nodes(tokens: Dict[int, Dict[int, Token]], graph:Optional[Graph]=None) -> Graph:
 
-    node_object_dict = {}
+    graph = graph if graph is not None else Graph()
 
     # first, just make all nodes
     for sent_idx, tokidx2tok_dict in sorted(tokens.items()):
 
         for tok_idx, token_obj in sorted(tokidx2tok_dict.items()):
 
-            node_id = f"id_s{sent_idx}_t{tok_idx}_node"
-            curr_node = Node(node_id, token_obj)
-            token_obj.node_id = node_id
-            node_object_dict[node_id] = curr_node
+            graph.add_node(token_obj)
 
     # link all nodes within the sentences
     for sent_idx, tokidx2tok_dict in sorted(tokens.items()):
 
         for tok_idx, token_obj in sorted(tokidx2tok_dict.items()):
-            curr_node_id = token_obj.node_id
 
             if not token_obj.is_start_token:
                 previous_token = tokidx2tok_dict[tok_idx-1]
-                node_id_to_previous_token = previous_token.node_id
-                node_object_dict[curr_node_id].add_incoming_node_id(node_id_to_previous_token)
-                node_object_dict[node_id_to_previous_token].add_outgoing_node_id(curr_node_id)
+                graph.add_edge(previous_token.node_id, token_obj.node_id)
 
-    return node_object_dict
+    return graph
 
 
 # def _generate_nodes(tokens: Dict[int, Dict[int, Token]], start_node, end_node) -> List[Node]:
@@ -219,205 +231,753 @@ def _generate_nodes(tokens: Dict[int, Dict[int, Token]]) -> List[Node]:
 #     return start_node, end_node
 
 
-def _get_node_id_list_with_token_word(curr_token_word:str, curr_node_id:str, node_dict: Dict[str, Node]) -> List[str]:
-
-    node_id_list_with_token_word = []
-
-    for node_id, node_obj in node_dict.items():
-        if node_id == curr_node_id:
+class ChainCache:
+    """
+    Memoized word chains of the nodes in the incoming and outgoing direction.
+
+    A word chain of a node is the list of token words from the node up to the start (incoming) or end (outgoing)
+    of the sentence, following the first incoming or outgoing neighbour of the nodes. The chains are stored in
+    a trie: each chain gets an integer id built from its first word and the id of the rest of the chain, thus
+    two chains are equal iff their ids are equal, and each node's chain is computed only once.
+    After a merge, update() recomputes the chains of the nodes whose first neighbour has changed, and of their
+    "children" (the nodes continuing their chain with them) only as long as the chain ids really change.
+
+    The chain id includes the word of the node, thus the nodes with the same chain id are the nodes with the same
+    token word and the same word chain. The chains of all nodes are computed at the beginning, and the nodes are
+    indexed by their chain ids (kept up to date by update()): finding the nodes matching a node is a lookup.
+    """
+
+    def __init__(self, node_dict: Graph, node_ids:Optional[Iterable[int]]=None) -> None:
+        """With node_ids, only the chains of these nodes (a part of the graph closed under the edges) are kept."""
+        self.__node_dict = node_dict
+        self.__chain_ids = {}  # (word id, id of the rest of the chain) -> id of the chain
+        self.__node_chain_ids = {direction: {} for direction in DIRECTIONS}
+        self.__chain_node_ids = {direction: {} for direction in DIRECTIONS}  # chain id -> ids of the nodes
+        self.__first_neighbour_children = {direction: {} for direction in DIRECTIONS}
+        node_ids = list(node_dict if node_ids is None else node_ids)
+        for node_id in node_ids:
+            for direction, first_neighbour_node_id in self.get_first_neighbour_node_ids(node_id).items():
+                if first_neighbour_node_id is not None:
+                    self.__first_neighbour_children[direction].setdefault(first_neighbour_node_id, set()).add(node_id)
+        for direction in DIRECTIONS:
+            for node_id in node_ids:
+                self.get_chain_id(node_id, direction)
+
+    def get_first_neighbour_node_ids(self, node_id:int) -> Dict[str, Optional[int]]:
+        return {direction: _get_first_neighbour_node_id(self.__node_dict[node_id], direction)
+                for direction in DIRECTIONS}
+
+    def get_chain_id(self, node_id:int, direction:str) -> int:
+
+        node_chain_ids = self.__node_chain_ids[direction]
+        if node_id in node_chain_ids:
+            return node_chain_ids[node_id]
+
+        path = []
+        path_node_ids = set()
+        curr_node_id = node_id
+        while curr_node_id is not None and curr_node_id not in node_chain_ids:
+            if curr_node_id in path_node_ids:  # cycle: end of the chain
+                break
+            path.append(curr_node_id)
+            path_node_ids.add(curr_node_id)
+            curr_node_id = _get_first_neighbour_node_id(self.__node_dict[curr_node_id], direction)
+
+        chain_id = node_chain_ids.get(curr_node_id, -1)
+        METRICS.count("chain_materializations", len(path))
+        chain_node_ids = self.__chain_node_ids[direction]
+        for path_node_id in reversed(path):
+            chain_key = (self.__node_dict[path_node_id].word_id, chain_id)
+            chain_id = self.__chain_ids.setdefault(chain_key, len(self.__chain_ids))
+            node_chain_ids[path_node_id] = chain_id
+            chain_node_ids.setdefault(chain_id, set()).add(path_node_id)
+
+        return chain_id
+
+    def get_node_ids_with_chain(self, chain_id:int, direction:str) -> Set[int]:
+        """Ids of the nodes with the chain (i.e. with the same token word and word chain); only readable."""
+        return self.__chain_node_ids[direction].get(chain_id, set())
+
+    def get_matching_node_id(self, node_id:int, direction:str) -> Optional[int]:
+        """The lowest id of the other nodes with the same token word and word chain as the node, if any."""
+
+        node_ids = self.get_node_ids_with_chain(self.get_chain_id(node_id, direction), direction)
+        if len(node_ids) < 2:
+            return None
+        return min(other_node_id for other_node_id in node_ids if other_node_id != node_id)
+
+    def __forget_chain_id(self, node_id:int, direction:str) -> Optional[int]:
+        """Drop the chain of the node (to be recomputed); return its previous chain id."""
+
+        chain_id = self.__node_chain_ids[direction].pop(node_id, None)
+        if chain_id is not None:
+            chain_node_ids = self.__chain_node_ids[direction]
+            chain_node_ids[chain_id].discard(node_id)
+            if not chain_node_ids[chain_id]:
+                del chain_node_ids[chain_id]
+        return chain_id
+
+    def update(self, first_neighbour_node_ids_before: Dict[int, Dict[str, Optional[int]]]) -> Set[int]:
+        """
+        Update the chains after a merge, given the first neighbours of the touched nodes before the merge
+        (see get_first_neighbour_node_ids()). Return the ids of the nodes whose word chain has changed.
+        """
+
+        changed_node_ids = set()
+        for direction in DIRECTIONS:
+            children = self.__first_neighbour_children[direction]
+            node_chain_ids = self.__node_chain_ids[direction]
+
+            original_chain_ids = {}
+            queue = deque()
+            for node_id, first_neighbour_node_ids in first_neighbour_node_ids_before.items():
+                before = first_neighbour_node_ids[direction]
+                after = _get_first_neighbour_node_id(self.__node_dict[node_id], direction) \
+                    if node_id in self.__node_dict else None
+                if before == after:
+                    continue
+                if before is not None:
+                    children[before].discard(node_id)
+                if after is not None:
+                    children.setdefault(after, set()).add(node_id)
+                if node_id in self.__node_dict:
+                    original_chain_ids[node_id] = node_chain_ids.get(node_id)
+                    queue.append(node_id)
+            for node_id in first_neighbour_node_ids_before:
+                if node_id not in self.__node_dict:  # merged into another node
+                    self.__forget_chain_id(node_id, direction)
+                    children.pop(node_id, None)
+
+            # a node can be queued several times if it is below several changed nodes;
+            # the limit only matters for cyclic graphs where the chains are not well-defined
+            max_recomputations = len(queue) + 1
+            recomputations = {}
+            while queue:
+                node_id = queue.popleft()
+                previous_chain_id = self.__forget_chain_id(node_id, direction)
+                recomputations[node_id] = recomputations.get(node_id, 0) + 1
+                if recomputations[node_id] > max_recomputations:
+                    continue
+                if self.get_chain_id(node_id, direction) != previous_chain_id:
+                    for child_node_id in children.get(node_id, ()):
+                        original_chain_ids.setdefault(child_node_id, node_chain_ids.get(child_node_id))
+                        queue.append(child_node_id)
+
+            changed_node_ids.update(node_id for node_id, original_chain_id in original_chain_ids.items()
+                                    if node_chain_ids.get(node_id) != original_chain_id)
+
+        return changed_node_ids
+
+
+def _get_first_neighbour_node_id(node_obj: Node, direction:str) -> Optional[int]:
+    """The chains are built along the first incoming/outgoing neighbour of the nodes."""
+    return node_obj.first_incoming_node_id if direction == "incoming" else node_obj.first_outgoing_node_id
+
+
+def merge_graph_2_paraphrases(node_dict: Graph, merge_log:Optional[List[Tuple[int, int]]]=None,
+                              worklist:Optional[List[int]]=None, checkpoint_filename:Optional[str]=None,
+                              checkpoint_interval:float=CHECKPOINT_INTERVAL, keep_current_node:bool=False) -> Graph:
+    """
+    Merge nodes with the same token word and the same incoming or outgoing word chain until no change is possible.
+
+    Worklist version of the former "restart from the first node after every merge" loop:
+    the nodes to (re)check are kept in a heap ordered by their node id (i.e. their position in the graph),
+    thus the merges happen in exactly the same order as before. After a merge, only the nodes whose checks
+    could have a different result are put back to the worklist (see _merge_and_collect_dirty_node_ids).
+    With merge_log, the merges (node id, merged node id) are appended to it in their order.
+
+    With checkpoint_filename, the graph and the worklist are saved at most every checkpoint_interval seconds
+    (see paraphrase_checkpoint.py); a killed merging can be resumed from the loaded graph and worklist.
+    The result is the same as without interruption, except for graphs with cycles, where the cached word chains
+    (cut at the first repeated node) depend on the history of the merges.
+    With keep_current_node, the current node is checked again at once after a merge (see _merge_worklist).
+    """
+
+    chain_cache = ChainCache(node_dict)
+    worklist = list(node_dict) if worklist is None else list(worklist)
+
+    return _merge_worklist(node_dict, worklist, chain_cache, merge_log,
+                           checkpoint_filename, checkpoint_interval, keep_current_node)
+
+
+def _merge_worklist(node_dict: Graph, worklist:List[int], chain_cache,
+                    merge_log:Optional[List[Tuple[int, int]]]=None, checkpoint_filename:Optional[str]=None,
+                    checkpoint_interval:float=CHECKPOINT_INTERVAL, keep_current_node:bool=False) -> Graph:
+    """
+    Check the nodes of the worklist (and the nodes made dirty by merges) in node id order.
+
+    After a merge, the current node is dirty itself. With keep_current_node, it is checked again at once instead of
+    going through the worklist, as long as no node with a lower id is queued (that one would be checked first),
+    thus the order of the merges is the same.
+    """
+
+    heapq.heapify(worklist)
+    queued_node_ids = set(worklist)
+    last_checkpoint_time = time.monotonic()
+    progress = Progress("merging", "nodes checked")
+    node_check_count = match_count = 0
+
+    while worklist:
+        curr_node_id = heapq.heappop(worklist)
+        queued_node_ids.discard(curr_node_id)
+        if curr_node_id not in node_dict:  # already merged into another node
             continue
-        if curr_token_word == node_obj.token_word:
-            node_id_list_with_token_word.append(node_id)
-
-    return node_id_list_with_token_word
-
-
-def _get_incoming_node_id_chains(node_id: str, node_dict: Dict[str, Node]) -> List[List[str]]:
-
-    incoming_node_id_chains = __get_incoming_node_id_chains(node_id, [[]], node_dict)
-
-    return incoming_node_id_chains
-
-
-def __get_incoming_node_id_chains(curr_node_id:str, curr_node_lists: List, node_dict:Dict[str, Node]) -> List[List[str]]:
-
-    for node_list in curr_node_lists:
-        node_list.append(curr_node_id)
-    incoming_node_ids = node_dict[curr_node_id].incoming_node_ids
-    for incoming_node_id in incoming_node_ids:
-        return __get_incoming_node_id_chains(incoming_node_id, curr_node_lists, node_dict)
-
-    return curr_node_lists
-
-
-def _get_incoming_current_chain(curr_node_id, node_dict):
-    curr_incoming_node_id_chain = _get_incoming_node_id_chains(curr_node_id, node_dict)[0]
-    curr_incoming_word_chain = [node_dict[nid].token_word for nid in curr_incoming_node_id_chain]
-    return curr_incoming_word_chain
-
-
-def _get_incoming_candidate_chains(node_id_list_with_curr_token_word, node_dict):
-    cand_incoming_word_chains = []
-    for node_id_with_curr_word in node_id_list_with_curr_token_word:
-        cand_node_id_chain_list = _get_incoming_node_id_chains(node_id_with_curr_word, node_dict)
-        for cand_node_id_chain in cand_node_id_chain_list:
-            cand_word_chain = [node_dict[nid].token_word for nid in cand_node_id_chain]
-            cand_incoming_word_chains.append(cand_word_chain)
-    return cand_incoming_word_chains
-
-
-def _get_outgoing_node_id_chains(node_id: str, node_dict: Dict[str, Node]) -> List[List[str]]:
-
-    outgoing_node_id_chains = __get_outgoing_node_id_chains(node_id, [[]], node_dict)
-    return outgoing_node_id_chains
+        node_check_count += 1
+        # the dirty nodes are requeued, thus the total is only an estimation
+        progress.update(node_check_count, node_check_count + len(worklist), f"{len(node_dict)} nodes left")
+        try:
+            MEMORY_BUDGET.check("merge")
+        except MemoryBudgetExceeded:
+            if checkpoint_filename is not None:  # spill the merge state for resuming
+                heapq.heappush(worklist, curr_node_id)
+                queued_node_ids.add(curr_node_id)
+                save_graph(node_dict, checkpoint_filename, queued_node_ids)
+                logger.info(f"- checkpoint with {len(node_dict)} nodes saved to '{checkpoint_filename}'")
+            raise
+
+        curr_node_obj = node_dict[curr_node_id]
+        direction_idx = 0
+        while direction_idx < len(DIRECTIONS):
+            match_count += 1
+            matching_node_id = _changing_match(curr_node_obj, chain_cache, DIRECTIONS[direction_idx])
+            if matching_node_id is None:
+                direction_idx += 1
+                continue
+            dirty_node_ids = _merge_and_collect_dirty_node_ids(curr_node_obj, matching_node_id, node_dict,
+                                                               chain_cache, merge_log)
+            if keep_current_node:
+                dirty_node_ids.discard(curr_node_id)
+            for dirty_node_id in dirty_node_ids - queued_node_ids:
+                heapq.heappush(worklist, dirty_node_id)
+                queued_node_ids.add(dirty_node_id)
+            if checkpoint_filename is not None and time.monotonic() - last_checkpoint_time >= checkpoint_interval:
+                save_graph(node_dict, checkpoint_filename, queued_node_ids | {curr_node_id})
+                last_checkpoint_time = time.monotonic()
+                logger.info(f"- checkpoint with {len(node_dict)} nodes saved to '{checkpoint_filename}'")
+            if not keep_current_node:
+                break
+            if worklist and worklist[0] < curr_node_id:
+                heapq.heappush(worklist, curr_node_id)
+                queued_node_ids.add(curr_node_id)
+                break
+            direction_idx = 0  # the current node is checked again
 
+    METRICS.count("merge_node_checks", node_check_count)
+    METRICS.count("changing_match_calls", match_count)
+    return node_dict
 
-def __get_outgoing_node_id_chains(curr_node_id:str, curr_node_lists: List, node_dict:Dict[str, Node]) -> List[List[str]]:
 
-    for node_list in curr_node_lists:
-        node_list.append(curr_node_id)
-    outgoing_node_ids = node_dict[curr_node_id].outgoing_node_ids
-    for outgoing_node_id in outgoing_node_ids:
-        return __get_outgoing_node_id_chains(outgoing_node_id, curr_node_lists, node_dict)
+def _changing_match(curr_node_obj, chain_cache, direction:str) -> Optional[int]:
+    """
+    Return the id of the first candidate node (in node id order) with the same token word and the same word chain
+    in the given direction, if any.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError
+    return chain_cache.get_matching_node_id(curr_node_obj.node_id, direction)
 
-    return curr_node_lists
 
+def _merge_and_collect_dirty_node_ids(curr_node_obj, node_id_with_curr_word, node_dict, chain_cache,
+                                      merge_log=None) -> Set[int]:
+    """
+    Merge the node into curr_node_obj and return the nodes to be checked again: the merged node, the nodes whose
+    word chain has changed, and the nodes whose word chain (with the token word) now equals the new chain of one
+    of these. The check of any other node cannot find a new match: neither its chains nor the chains of the
+    nodes with its token word and word chains have changed (merged nodes only disappear from the candidates).
+    """
 
-def _get_outgoing_current_chain(curr_node_id, node_dict):
-    curr_outgoing_node_id_chain = _get_outgoing_node_id_chains(curr_node_id, node_dict)[0]
-    curr_outgoing_word_chain = [node_dict[nid].token_word for nid in curr_outgoing_node_id_chain]
-    return curr_outgoing_word_chain
+    candidate_obj = node_dict[node_id_with_curr_word]
+    touched_node_ids = {curr_node_obj.node_id, node_id_with_curr_word}
+    touched_node_ids.update(candidate_obj.incoming_node_ids)
+    touched_node_ids.update(candidate_obj.outgoing_node_ids)
+    first_neighbour_node_ids_before = {node_id: chain_cache.get_first_neighbour_node_ids(node_id)
+                                       for node_id in touched_node_ids}
 
+    __merge_node(curr_node_obj, node_id_with_curr_word, node_dict, merge_log)
 
-def _get_outgoing_candidate_chains(node_id_list_with_curr_token_word, node_dict):
-    cand_outgoing_word_chains = []
-    for node_id_with_curr_word in node_id_list_with_curr_token_word:
-        cand_node_id_chain_list = _get_outgoing_node_id_chains(node_id_with_curr_word, node_dict)
-        for cand_node_id_chain in cand_node_id_chain_list:
-            cand_word_chain = [node_dict[nid].token_word for nid in cand_node_id_chain]
-            cand_outgoing_word_chains.append(cand_word_chain)
-    return cand_outgoing_word_chains
+    dirty_node_ids = {curr_node_obj.node_id}
+    for node_id in chain_cache.update(first_neighbour_node_ids_before):
+        dirty_node_ids.add(node_id)
+        for direction in DIRECTIONS:
+            dirty_node_ids.update(chain_cache.get_node_ids_with_chain(chain_cache.get_chain_id(node_id, direction),
+                                                                      direction))
+    return dirty_node_ids
 
 
-def merge_graph_2_paraphrases(node_dict: Dict[str, Node]) -> Dict[str, Node]:
+def __merge_node(curr_node_obj, node_id_with_curr_word, node_dict, merge_log=None):
+    
+    curr_node_id = curr_node_obj.node_id
+    METRICS.count("merges")
+    if merge_log is not None:
+        merge_log.append((curr_node_id, node_id_with_curr_word))
+    incoming_node_ids_for_cand = list(node_dict[node_id_with_curr_word].incoming_node_ids)
+    for incoming_node_id in incoming_node_ids_for_cand:
+        if not node_dict.has_edge(incoming_node_id, curr_node_id):
+            node_dict.add_edge(incoming_node_id, curr_node_id)
+        node_dict.del_edge(incoming_node_id, node_id_with_curr_word)
 
-    single_node_token_words = []
+    outgoing_node_ids_for_cand = list(node_dict[node_id_with_curr_word].outgoing_node_ids)
+    for outgoing_node_id in outgoing_node_ids_for_cand:
+        if not node_dict.has_edge(curr_node_id, outgoing_node_id):
+            node_dict.add_edge(curr_node_id, outgoing_node_id)
+        node_dict.del_edge(node_id_with_curr_word, outgoing_node_id)
+    
+    curr_node_obj.merge_tokens(node_dict[node_id_with_curr_word])
+    del node_dict[node_id_with_curr_word]
 
-    is_graph_changed = True
-    while is_graph_changed is True:
-        is_graph_changed = False
-        if len(node_dict)%50 == 0:
-            logger.info(f"- merging turn with {len(node_dict)} nodes")
 
-        for curr_node_id, curr_node_obj in node_dict.items():
-            curr_token_word = curr_node_obj.token_word
-            if curr_token_word in single_node_token_words:
+def merge_graph_2_paraphrases_by_signature(node_dict: Graph, merge_log:Optional[List[Tuple[int, int]]]=None,
+                                           worklist:Optional[List[int]]=None, checkpoint_filename:Optional[str]=None,
+                                           checkpoint_interval:float=CHECKPOINT_INTERVAL) -> Graph:
+    """
+    merge_graph_2_paraphrases, with the current node keeping on absorbing the nodes with its token word and word
+    chain (looked up by chain id, see ChainCache) without going back through the worklist after each merge.
+    The merges happen in the same order, thus the result is the same (see check_merge_engines.py).
+    """
+
+    return merge_graph_2_paraphrases(node_dict, merge_log, worklist, checkpoint_filename, checkpoint_interval,
+                                     keep_current_node=True)
+
+
+MERGE_ENGINES = {
+    "fixpoint": merge_graph_2_paraphrases,
+    "signature": merge_graph_2_paraphrases_by_signature,
+}
+
+
+class ParaphraseGraph:
+    """
+    Paraphrase graph to which sentences can be added, with the same result as a full rebuild
+    (merge_graph_2_paraphrases on the initial graph of all sentences).
+
+    The merges depend on their order, thus the nodes of a new sentence cannot simply be merged into the existing
+    graph: the merges have to be made again in the order of the full merge. However, only the independent sentence
+    group of the new sentence is affected (sentences connected by common first or last words, see
+    _get_independent_sentence_groups): the nodes of this group are reset to the initial sentence chains and merged
+    again, the other groups are kept as they are. Thus an addition costs the merge of its group, which is the whole
+    graph if all sentences share a first or last word (e.g. with the artificial start and end token, '-e').
+    Adding many sentences at once (add_sentences) merges each affected group only once.
+    A duplicate of a sentence only adds to the multiplicity of the sentence (as in build_initial_graph): the counts
+    of its nodes are updated in place, nothing is merged.
+    """
+
+    def __init__(self, tokenized_sentences:Iterable[List[str]]=()) -> None:
+
+        self.__node_dict = Graph()
+        self.__sentence_idxs = {}  # type: Dict[Tuple[int, ...], int]  # word ids -> sentence index
+        self.__input_sentence_count = 0
+        self.__sentence_tokens = []  # type: List[List[Token]]
+        self.__sentence_first_node_ids = []  # type: List[int]
+        self.__merged_node_ids = {}  # type: Dict[int, int]  # merged node id -> id of the node it was merged into
+        self.__group_parents = []  # type: List[int]  # union-find of the sentence groups
+        self.__group_sentences = {}  # type: Dict[int, List[int]]  # root sentence -> sentences of the group (unsorted)
+        self.__sentence_by_boundary_word = {}  # type: Dict[Tuple[str, int], int]
+        self.add_sentences(tokenized_sentences)
+
+    @property
+    def node_dict(self) -> Graph:
+        return self.__node_dict
+
+    @property
+    def sentence_count(self) -> int:
+        """Number of unique sentences."""
+        return len(self.__sentence_tokens)
+
+    def add_sentence(self, tokens:List[str]) -> None:
+        self.add_sentences([tokens])
+
+    def add_sentences(self, tokenized_sentences:Iterable[List[str]]) -> None:
+        """Add the sentences and merge their groups again (empty sentences are skipped, as in the input files)."""
+
+        node_dict = self.__node_dict
+        first_new_sent_idx = self.sentence_count
+        duplicated_sent_idxs = []
+        for sentence_chunk in iter_sentence_chunks(self.__iter_new_sentences(tokenized_sentences,
+                                                                             duplicated_sent_idxs),
+                                                   SENTENCE_CHUNK_SIZE):
+            token_dict = _generate_tokens(sentence_chunk, self.sentence_count)
+            _generate_nodes(token_dict, node_dict)
+            for sent_idx, tokidx2tok_dict in sorted(token_dict.items()):
+                self.__sentence_tokens.append([token_obj for tok_idx, token_obj in sorted(tokidx2tok_dict.items())])
+                self.__sentence_first_node_ids.append(tokidx2tok_dict[0].node_id)
+                self.__group_parents.append(sent_idx)
+                self.__group_sentences[sent_idx] = [sent_idx]
+                self.__add_to_group(sent_idx)
+
+        for sent_idx in duplicated_sent_idxs:
+            if sent_idx < first_new_sent_idx:  # the new sentences get their counts when their group is merged
+                for node_id in self.__get_sentence_node_ids(sent_idx):
+                    node_dict[node_id].count += 1
+
+        for root_sent_idx in {self.__find_group(sent_idx) for sent_idx in range(first_new_sent_idx,
+                                                                                self.sentence_count)}:
+            self.__merge_group(sorted(self.__group_sentences[root_sent_idx]))
+
+    def __find_group(self, sent_idx:int) -> int:
+        parents = self.__group_parents
+        while parents[sent_idx] != sent_idx:
+            parents[sent_idx] = parents[parents[sent_idx]]
+            sent_idx = parents[sent_idx]
+        return sent_idx
+
+    def __add_to_group(self, sent_idx:int) -> None:
+
+        tokens = self.__sentence_tokens[sent_idx]
+        for boundary_word in (("first", tokens[0].word_id), ("last", tokens[-1].word_id)):
+            root_sent_idx = self.__find_group(sent_idx)
+            other_root_sent_idx = self.__find_group(self.__sentence_by_boundary_word.setdefault(boundary_word,
+                                                                                                 sent_idx))
+            if root_sent_idx != other_root_sent_idx:
+                if len(self.__group_sentences[root_sent_idx]) < len(self.__group_sentences[other_root_sent_idx]):
+                    root_sent_idx, other_root_sent_idx = other_root_sent_idx, root_sent_idx
+                self.__group_parents[other_root_sent_idx] = root_sent_idx
+                self.__group_sentences[root_sent_idx].extend(self.__group_sentences.pop(other_root_sent_idx))
+
+    def __merge_group(self, sent_idxs:List[int]) -> None:
+        """Reset the nodes of the sentences to the initial sentence chains (with the current counts) and merge them."""
+
+        node_dict = self.__node_dict
+        group_node_ids = []
+        for sent_idx in sent_idxs:
+            first_node_id = self.__sentence_first_node_ids[sent_idx]
+            sentence_count = node_dict.get_sentence_count(sent_idx)
+            for tok_idx, token_obj in enumerate(self.__sentence_tokens[sent_idx]):
+                node_dict.reset_node(first_node_id + tok_idx, token_obj, sentence_count)
+                if tok_idx > 0:
+                    node_dict.add_edge(first_node_id + tok_idx - 1, first_node_id + tok_idx)
+                self.__merged_node_ids.pop(first_node_id + tok_idx, None)
+                group_node_ids.append(first_node_id + tok_idx)
+
+        merge_log = []
+        _merge_worklist(node_dict, group_node_ids, ChainCache(node_dict, group_node_ids), merge_log)
+        for node_id, merged_node_id in merge_log:
+            self.__merged_node_ids[merged_node_id] = node_id
+
+    def __get_sentence_node_ids(self, sent_idx:int) -> List[int]:
+        """The ids of the nodes of the tokens of the sentence (following the merges, with path compression)."""
+
+        merged_node_ids = self.__merged_node_ids
+        first_node_id = self.__sentence_first_node_ids[sent_idx]
+        sentence_node_ids = []
+        for node_id in range(first_node_id, first_node_id + len(self.__sentence_tokens[sent_idx])):
+            path = []
+            while node_id in merged_node_ids:
+                path.append(node_id)
+                node_id = merged_node_ids[node_id]
+            for path_node_id in path[:-1]:
+                merged_node_ids[path_node_id] = node_id
+            sentence_node_ids.append(node_id)
+        return sentence_node_ids
+
+    def __iter_new_sentences(self, tokenized_sentences:Iterable[List[str]],
+                             duplicated_sent_idxs:List[int]) -> Iterator[List[str]]:
+        """
+        The sentences not seen yet (see _iter_unique_sentences); the indices of the duplicated sentences are
+        appended to the list.
+        """
+
+        add_word = VOCABULARY.add
+        for tokens in tokenized_sentences:
+            if not tokens:
                 continue
-            node_id_list_with_curr_token_word = _get_node_id_list_with_token_word(curr_token_word, curr_node_id,
-                                                                                  node_dict)
-            if len(node_id_list_with_curr_token_word) < 1:
-                single_node_token_words.append(curr_token_word)
+            sentence_key = tuple(map(add_word, tokens))
+            sent_idx = self.__sentence_idxs.get(sentence_key)
+            if sent_idx is None:
+                self.__sentence_idxs[sentence_key] = self.__node_dict.add_sentence(self.__input_sentence_count)
+                yield tokens
             else:
-                is_graph_changed = _changing_match(curr_node_obj, node_id_list_with_curr_token_word, node_dict,
-                                                   "incoming")
-                if is_graph_changed is True:
-                    break
-
-                is_graph_changed = _changing_match(curr_node_obj, node_id_list_with_curr_token_word, node_dict,
-                                                   "outgoing")
-                if is_graph_changed is True:
-                    break
-            if is_graph_changed:
-                break
+                self.__node_dict.add_duplicate_sentence(sent_idx, self.__input_sentence_count)
+                duplicated_sent_idxs.append(sent_idx)
+            self.__input_sentence_count += 1
+
+    def __len__(self) -> int:
+        return len(self.__node_dict)
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        return f"ParaphraseGraph with {self.sentence_count} sentences and {len(self)} nodes"
+
+
+def merge_graph_2_paraphrases_in_parallel(node_dict: Graph, engine:str="fixpoint", workers:int=1) -> Graph:
+    """
+    Merge the independent sentence groups of the initial graph (see _get_independent_sentence_groups)
+    in a process pool with the given merge engine.
+
+    The groups are packed into batches of about the same size. Each worker builds the initial graph of a batch,
+    merges it and returns the merges in their order. The merges are replayed on node_dict, thus the result is
+    the same as merging node_dict as a whole.
+    """
+
+    sentence_node_ids = _get_sentence_node_ids(node_dict)
+    sentence_groups = _get_independent_sentence_groups(node_dict, sentence_node_ids)
+    if workers <= 1 or len(sentence_groups) <= 1:
+        return MERGE_ENGINES[engine](node_dict)
+
+    batches = _pack_sentence_groups(sentence_groups, sentence_node_ids, workers * GROUP_BATCHES_PER_WORKER)
+    logger.info(f"- merging {len(sentence_groups)} independent sentence groups in {len(batches)} batches "
+                f"with {workers} workers")
+    batch_node_ids = [[node_id for sent_idx in batch for node_id in sentence_node_ids[sent_idx]]
+                      for batch in batches]
+    batch_arguments = [(engine, [[node_dict[node_id].token_word for node_id in sentence_node_ids[sent_idx]]
+                                 for sent_idx in batch])
+                       for batch in batches]
+
+    from concurrent.futures import ProcessPoolExecutor  # deferred: slow import, only needed for the workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for node_ids, merge_log in zip(batch_node_ids, executor.map(_merge_sentence_batch, batch_arguments)):
+            for curr_node_idx, merged_node_idx in merge_log:
+                __merge_node(node_dict[node_ids[curr_node_idx]], node_ids[merged_node_idx], node_dict)
+            MEMORY_BUDGET.check("merge")
 
     return node_dict
 
 
-def _changing_match(curr_node_obj, node_id_list_with_curr_token_word, node_dict, direction:str):
-    curr_node_id = curr_node_obj.node_id
-    if direction == "incoming":
-        curr_word_chain = _get_incoming_current_chain(curr_node_id, node_dict)
-        cand_word_chains = _get_incoming_candidate_chains(node_id_list_with_curr_token_word, node_dict)
-    elif direction == "outgoing":
-        curr_word_chain = _get_outgoing_current_chain(curr_node_id, node_dict)
-        cand_word_chains = _get_outgoing_candidate_chains(node_id_list_with_curr_token_word, node_dict)
-    else:
-        raise ValueError
-    
-    is_graph_changed = False
-    for node_id_with_curr_word, cand_word_chain in \
-        zip(node_id_list_with_curr_token_word, cand_word_chains):
-        if curr_word_chain == cand_word_chain:
-            __merge_node(curr_node_obj, node_id_with_curr_word, node_dict)
-            is_graph_changed = True
-            break
-    return is_graph_changed
+def _merge_sentence_batch(batch_arguments:Tuple[str, List[List[str]]]) -> List[Tuple[int, int]]:
+    """Worker: merges of the initial graph of the sentences (node ids are the token positions in the batch)."""
 
+    engine, tokenized_sentences = batch_arguments
+    merge_log = []
+    MERGE_ENGINES[engine](build_initial_graph(tokenized_sentences), merge_log)
+    return merge_log
 
-def __merge_node(curr_node_obj, node_id_with_curr_word, node_dict):
-    
-    curr_node_id = curr_node_obj.node_id
-    incoming_node_ids_for_cand = node_dict[node_id_with_curr_word].incoming_node_ids
-    for incoming_node_id in incoming_node_ids_for_cand:
-        if incoming_node_id not in curr_node_obj.incoming_node_ids:
-            curr_node_obj.add_incoming_node_id(incoming_node_id)
-        if curr_node_id not in node_dict[incoming_node_id].outgoing_node_ids:
-            node_dict[incoming_node_id].outgoing_node_ids.append(curr_node_id)
-        node_dict[incoming_node_id].del_outgoing_node_id(node_id_with_curr_word)
-
-    outgoing_node_ids_for_cand = node_dict[node_id_with_curr_word].outgoing_node_ids
-    for outgoing_node_id in outgoing_node_ids_for_cand:
-        if outgoing_node_id not in curr_node_obj.outgoing_node_ids:
-            curr_node_obj.add_outgoing_node_id(outgoing_node_id)
-        if curr_node_id not in node_dict[outgoing_node_id].incoming_node_ids:
-            node_dict[outgoing_node_id].add_incoming_node_id(curr_node_id)
-        node_dict[outgoing_node_id].del_incoming_node_id(node_id_with_curr_word)
-    
-    for token in node_dict[node_id_with_curr_word].token_objects:
-        curr_node_obj.token_objects.append(token)
-    del node_dict[node_id_with_curr_word]
 
+def _get_sentence_node_ids(node_dict: Graph) -> Dict[int, List[int]]:
+    """The node ids of each sentence of the initial graph (in token order)."""
 
-def build_initial_graph(sentence_list:List[List[str]]) -> Dict[str, Node]:
+    sentence_node_ids = {}
+    for node_id, node_obj in node_dict.items():
+        sentence_node_ids.setdefault(node_obj.token_positions[0], []).append(node_id)
+    return sentence_node_ids
+
+
+def _get_independent_sentence_groups(node_dict: Graph, sentence_node_ids: Dict[int, List[int]]) -> List[List[int]]:
+    """
+    Group the sentences of the initial graph such that no merge can join nodes of different groups.
+
+    An incoming word chain ends at a node without incoming neighbours, i.e. at the first word of a sentence,
+    and an outgoing word chain ends at the last word of a sentence. Thus, nodes of two sentences can only be merged
+    (directly or through other sentences) if the sentences are connected by sharing their first or last words.
+    The groups are these connected sets of sentences (union-find), in the order of their first sentence.
+    """
+
+    parents = {sent_idx: sent_idx for sent_idx in sentence_node_ids}
+
+    def find(sent_idx):
+        while parents[sent_idx] != sent_idx:
+            parents[sent_idx] = parents[parents[sent_idx]]
+            sent_idx = parents[sent_idx]
+        return sent_idx
+
+    sentence_by_boundary_word = {}
+    for sent_idx, node_ids in sentence_node_ids.items():
+        for boundary_word in (("first", node_dict[node_ids[0]].word_id), ("last", node_dict[node_ids[-1]].word_id)):
+            other_sent_idx = sentence_by_boundary_word.setdefault(boundary_word, sent_idx)
+            parents[find(sent_idx)] = find(other_sent_idx)
+
+    sentence_groups = {}
+    for sent_idx in sentence_node_ids:
+        sentence_groups.setdefault(find(sent_idx), []).append(sent_idx)
+    return list(sentence_groups.values())
+
+
+def _pack_sentence_groups(sentence_groups: List[List[int]], sentence_node_ids: Dict[int, List[int]],
+                          batch_number:int) -> List[List[int]]:
+    """Pack the sentence groups into (at most) batch_number batches of about the same number of nodes."""
+
+    def group_size(sentence_group):
+        return sum(len(sentence_node_ids[sent_idx]) for sent_idx in sentence_group)
+
+    batches = [[] for _ in range(min(batch_number, len(sentence_groups)))]
+    batch_heap = [(0, batch_idx) for batch_idx in range(len(batches))]
+    for sentence_group in sorted(sentence_groups, key=group_size, reverse=True):
+        batch_size, batch_idx = heapq.heappop(batch_heap)
+        batches[batch_idx].extend(sentence_group)
+        heapq.heappush(batch_heap, (batch_size + group_size(sentence_group), batch_idx))
+    return [sorted(batch) for batch in batches]
+
+
+def build_initial_graph(sentence_list:Iterable[List[str]], chunk_size:int=SENTENCE_CHUNK_SIZE) -> Graph:
+    """
+    Build the graph with one node chain per unique sentence: duplicate sentences are collapsed, the graph keeps
+    their multiplicity and input indices (see Graph). The sentences can be streamed (see iter_sentences);
+    they are consumed in chunks, thus only one chunk of the raw sentences is kept in memory at once
+    (and the word ids of the unique sentences, for finding the duplicates).
+    """
     
-    token_dict = _generate_tokens(sentence_list)
-    node_dict = _generate_nodes(token_dict)
+    node_dict = Graph()
+    sent_count = 0
+    sentence_first_node_ids = array("I")
+    progress = Progress("building the initial graph", "sentences")
+    unique_sentences = _iter_unique_sentences(sentence_list, node_dict)
+    for sentence_chunk in iter_sentence_chunks(unique_sentences, chunk_size):
+        token_dict = _generate_tokens(sentence_chunk, sent_count)
+        _generate_nodes(token_dict, node_dict)
+        sentence_first_node_ids.extend(token_dict[sent_idx][0].node_id for sent_idx in sorted(token_dict))
+        sent_count += len(sentence_chunk)
+        progress.update(sent_count, details=f"{len(node_dict)} nodes")
+        MEMORY_BUDGET.check("initial_graph")
+
+    # the duplicates are only known at the end: the counts of the nodes of the duplicated sentences
+    sentence_first_node_ids.append(len(node_dict))
+    for sent_idx, duplicate_sent_idxs in node_dict.duplicate_sentence_idxs.items():
+        for node_id in range(sentence_first_node_ids[sent_idx], sentence_first_node_ids[sent_idx + 1]):
+            node_dict[node_id].count = 1 + len(duplicate_sent_idxs)
+    METRICS.count("duplicate_sentences", sum(map(len, node_dict.duplicate_sentence_idxs.values())))
     return node_dict
 
 
+def _iter_unique_sentences(sentence_list:Iterable[List[str]], node_dict:Graph) -> Iterator[List[str]]:
+    """
+    Yield the first occurrence of each sentence; the sentences and their duplicates are registered in the graph.
+    Empty sentences are skipped (as by iter_sentences), they are not counted as input sentences either.
+    """
+
+    sentence_idxs = {}  # type: Dict[Tuple[int, ...], int]  # word ids -> sentence index
+    add_word = VOCABULARY.add
+    input_sent_idx = -1
+    for tokens in sentence_list:
+        if not tokens:
+            continue
+        input_sent_idx += 1
+        sentence_key = tuple(map(add_word, tokens))
+        sent_idx = sentence_idxs.get(sentence_key)
+        if sent_idx is None:
+            sentence_idxs[sentence_key] = node_dict.add_sentence(input_sent_idx)
+            yield tokens
+        else:
+            node_dict.add_duplicate_sentence(sent_idx, input_sent_idx)
+
+
 def main():
 
+    setup_logging()
     args = get_arguments(sys.argv)
     
     config_fn = args.config
     config = get_config(config_fn)
     
+    input_filenames = expand_input_filenames(args.input_filenames, args.input_pattern)
+    assert input_filenames, f"No input files found in {args.input_filenames}."
+    if len(input_filenames) > 1:
+        assert args.checkpoint is None, "A checkpoint file (--checkpoint) needs a single input file."
+        results = run_batch(_build_and_write_graph, input_filenames, args, config)
+        sys.exit(1 if any(result["error"] is not None for result in results) else 0)
+    args.input_filename = input_filenames[0]
+    
+    if args.memory_report:
+        METRICS.trace_memory()
+    if args.max_memory is not None:
+        MEMORY_BUDGET.max_bytes = args.max_memory << 20
+    try:
+        _build_and_write_graph(args, config)
+    except MemoryBudgetExceeded as e:
+        logger.error(f"! {e} Build stopped.")
+        if e.stage == "merge" and args.checkpoint is not None and args.workers <= 1:
+            logger.error(f"! The merging can be continued with '--resume --checkpoint {args.checkpoint}'.")
+        sys.exit(1)
+    finally:
+        if args.memory_report:
+            METRICS.log_memory_report()
+        if args.metrics is not None:
+            METRICS.write_json(args.metrics)
+            logger.info(f"Metrics written to '{args.metrics}'.")
+
+
+def _get_pruned_sentences(input_fn:str, config:Dict[str, Any], end_points:bool,
+                          pruning:Pruning) -> Iterable[List[str]]:
+    """
+    The words and transitions are counted in a first pass over the input, the pruned sentences are streamed
+    in a second one (the sentences of the standard input are kept in memory for it).
+    """
+    
+    tokenized_sentences = METRICS.timed(iter_sentences(input_fn, config, end_points), "read")
+    if input_fn == STDIN_FILENAME:
+        tokenized_sentences = list(tokenized_sentences)
+    with METRICS.stage("prune"):
+        word_counts, transition_counts = count_words(tokenized_sentences)
+        kept_word_counts, kept_transition_counts = prune_counts(word_counts, transition_counts, pruning)
+    logger.info(f"Pruning: {len(kept_word_counts)} of {len(word_counts)} words "
+                f"and {len(kept_transition_counts)} of {len(transition_counts)} transitions kept.")
+    METRICS.count("pruned_words", len(word_counts) - len(kept_word_counts))
+    METRICS.count("pruned_transitions", len(transition_counts) - len(kept_transition_counts))
+    if input_fn != STDIN_FILENAME:
+        tokenized_sentences = METRICS.timed(iter_sentences(input_fn, config, end_points), "read")
+    return prune_sentences(tokenized_sentences, kept_word_counts, kept_transition_counts)
+
+
+def _build_and_write_graph(args:argparse.Namespace, config:Dict[str, Any]) -> None:
+
     input_fn = args.input_filename
     
     
     end_points = args.end_points
-    ep = " with additional start/end points" if end_points else ""
-    logger.info(f"Reading sentences from '{input_fn}'{ep}.")
+    output_suffix = "_prp" + get_output_suffix(args.output_format, args.compress)
+    output_fn = get_output_filename(input_fn, args.output_dir, end_points, output_suffix)
+    pruning = Pruning.from_arguments(args)
     
-    output_dir = args.output_dir if args.output_dir else os.path.dirname(os.path.realpath(input_fn))
-    os.makedirs(output_dir, exist_ok=True)
-    ep = "_we" if end_points else ""
-    output_fn = os.path.join(output_dir, os.path.splitext(os.path.basename(input_fn))[0] + ep + "_prp.graphml")
+    build_cache, cache_key, cache_filename = None, None, None
+    if args.cache_dir is not None and input_fn != STDIN_FILENAME and not args.resume:
+        build_cache = BuildCache(args.cache_dir, args.cache_size << 20)
+        pruning_options = [repr(pruning)] if pruning.is_active else []
+        cache_key = get_cache_key("prp", input_fn, end_points, config, args.engine, *pruning_options)
+        cache_filename = build_cache.lookup(cache_key)
     
-    tokenized_sentences = read_sentences(input_fn, config, end_points)
-    initial_node_dict = build_initial_graph(tokenized_sentences)
-    
-    # make the paraphrases !
-    logger.info(f"Initial graph with {len(initial_node_dict)} nodes built.")
-    if len(initial_node_dict) > 1000:
-        very = ""
-        if len(initial_node_dict) > 2000:
-            very = "very "
-        logger.warning(f"! Generation of the paraphrase graphs with this initial size could be {very}slow.")
-    node_dict_paraphrases = merge_graph_2_paraphrases(initial_node_dict)
+    if cache_filename is not None:
+        logger.info(f"Loading the paraphrase graph from the cache '{cache_filename}'.")
+        with METRICS.stage("load"):
+            node_dict_paraphrases, _ = load_graph(cache_filename)
+    elif args.resume:
+        assert args.checkpoint is not None, "Resuming needs a checkpoint file (--checkpoint)."
+        logger.info(f"Loading the graph from the checkpoint '{args.checkpoint}'.")
+        with METRICS.stage("load"):
+            node_dict, worklist = load_graph(args.checkpoint)
+        logger.info(f"Graph with {len(node_dict)} nodes loaded, {len(worklist)} nodes to check.")
+        with METRICS.stage("merge"):
+            node_dict_paraphrases = MERGE_ENGINES[args.engine](node_dict, worklist=worklist,
+                                                               checkpoint_filename=args.checkpoint,
+                                                               checkpoint_interval=args.checkpoint_interval)
+    else:
+        ep = " with additional start/end points" if end_points else ""
+        logger.info(f"Reading sentences from '{input_fn}'{ep}.")
+        
+        if pruning.is_active:
+            tokenized_sentences = _get_pruned_sentences(input_fn, config, end_points, pruning)
+        else:
+            tokenized_sentences = METRICS.timed(iter_sentences(input_fn, config, end_points), "read")
+        with METRICS.stage("initial_graph"):
+            initial_node_dict = build_initial_graph(tokenized_sentences)
+        METRICS.count("initial_nodes", len(initial_node_dict))
+        
+        # make the paraphrases !
+        duplicate_count = sum(map(len, initial_node_dict.duplicate_sentence_idxs.values()))
+        logger.info(f"Initial graph with {len(initial_node_dict)} nodes of {initial_node_dict.sentence_number} unique "
+                    f"sentences built ({duplicate_count} duplicate sentences collapsed).")
+        if len(initial_node_dict) > 1000:
+            very = ""
+            if len(initial_node_dict) > 2000:
+                very = "very "
+            logger.warning(f"! Generation of the paraphrase graphs with this initial size could be {very}slow.")
+        with METRICS.stage("merge"):
+            if args.checkpoint is not None and args.workers <= 1:
+                node_dict_paraphrases = MERGE_ENGINES[args.engine](initial_node_dict,
+                                                                   checkpoint_filename=args.checkpoint,
+                                                                   checkpoint_interval=args.checkpoint_interval)
+            else:
+                node_dict_paraphrases = merge_graph_2_paraphrases_in_parallel(initial_node_dict, args.engine,
+                                                                              args.workers)
     
+    with METRICS.stage("save"):
+        if build_cache is not None and cache_filename is None:
+            build_cache.store(cache_key, lambda filename: save_graph(node_dict_paraphrases, filename))
+        if args.checkpoint is not None:
+            save_graph(node_dict_paraphrases, args.checkpoint)
+            logger.info(f"Paraphrase graph saved to '{args.checkpoint}'.")
     logger.info(f"Paraphrase graph with {len(node_dict_paraphrases)} nodes built.")
-    write_graphml(node_dict_paraphrases, config, output_fn)
+    METRICS.count("nodes", len(node_dict_paraphrases))
+    with METRICS.stage("write"):
+        write_graphml(node_dict_paraphrases, config, output_fn, output_format=args.output_format)
     logger.info(f"See output in '{output_fn}'.")
 
 if __name__ == "__main__":
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3.8
+
+"""
+Instrumentation of the builders: wall time of the stages, counters of the merge loop, rate-limited
+progress reports with throughput and ETA, the memory report of the stages (tracemalloc) and the memory budget.
+
+The module level METRICS collects the measurements of the process (as VOCABULARY does for the token words),
+and MEMORY_BUDGET is the memory limit of the process (unlimited by default); the worker processes are not included.
+"""
+
+import contextlib
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional, TypeVar
+
+from __init__ import logger
+
+
+PROGRESS_INTERVAL = 10.0  # seconds between two progress reports
+MEMORY_CHECK_INTERVAL = 1.0  # seconds between two checks of the memory budget
+TOP_ALLOCATION_NUMBER = 10  # allocation sites in the memory report
+
+T = TypeVar("T")
+
+
+class Metrics:
+    """
+    Stage times (exclusive: the time of a stage nested in another one is not counted for the outer one)
+    and counters, in the order of their first use.
+    With trace_memory(), the memory allocated by each stage (still allocated at its end) and the peak
+    of the traced memory during the stage are recorded as well; tracing slows down the build considerably.
+    """
+
+    def __init__(self) -> None:
+
+        self.__stage_seconds = {}  # type: Dict[str, float]
+        self.__counters = {}  # type: Dict[str, int]
+        self.__nested_seconds = []  # time of the nested stages, for each running stage
+        self.__stage_memory = {}  # type: Dict[str, Dict[str, int]]
+        self.is_tracing_memory = False
+
+    def trace_memory(self) -> None:
+        import tracemalloc  # deferred: slow import, only needed for the memory report
+        tracemalloc.start()
+        self.is_tracing_memory = True
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+
+        is_tracing = self.is_tracing_memory
+        if is_tracing:
+            import tracemalloc
+            snapshot_before = _take_snapshot()
+            memory_before, _ = tracemalloc.get_traced_memory()
+            if hasattr(tracemalloc, "reset_peak"):  # python >= 3.9, otherwise the peak is the peak so far
+                tracemalloc.reset_peak()
+        self.__nested_seconds.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested_seconds = self.__nested_seconds.pop()
+            self.__stage_seconds[name] = self.__stage_seconds.get(name, 0.0) + elapsed - nested_seconds
+            if self.__nested_seconds:
+                self.__nested_seconds[-1] += elapsed
+            if is_tracing:
+                memory_after, memory_peak = tracemalloc.get_traced_memory()
+                stage_memory = self.__stage_memory.setdefault(name, {"allocated_bytes": 0, "peak_bytes": 0})
+                stage_memory["allocated_bytes"] += memory_after - memory_before
+                stage_memory["peak_bytes"] = max(stage_memory["peak_bytes"], memory_peak)
+                statistics = _take_snapshot().compare_to(snapshot_before, "lineno")
+                stage_memory["top_allocations"] = [
+                    {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                     "bytes": stat.size_diff, "blocks": stat.count_diff}
+                    for stat in statistics[:TOP_ALLOCATION_NUMBER] if stat.size_diff > 0]
+
+    def timed(self, items: Iterable[T], name: str) -> Iterator[T]:
+        """Iterate the items, counting the time spent in producing them as the stage name (e.g. reading)."""
+
+        seconds = 0.0
+        iterator = iter(items)
+        try:
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, StopIteration)
+                seconds += time.perf_counter() - start
+                if item is StopIteration:
+                    return
+                yield item
+        finally:
+            self.__stage_seconds[name] = self.__stage_seconds.get(name, 0.0) + seconds
+            if self.__nested_seconds:
+                self.__nested_seconds[-1] += seconds
+
+    def count(self, name: str, increment: int = 1) -> None:
+        self.__counters[name] = self.__counters.get(name, 0) + increment
+
+    def get_count(self, name: str) -> int:
+        return self.__counters.get(name, 0)
+
+    def get_memory_report(self) -> Dict[str, Any]:
+        """
+        Memory of the stages (with the sites of the top allocations still allocated at the end of the stage)
+        and the peak memory of the process.
+        """
+
+        return {"stages": {name: dict(stage_memory) for name, stage_memory in self.__stage_memory.items()},
+                "traced_peak_bytes": max((stage_memory["peak_bytes"] for stage_memory in self.__stage_memory.values()),
+                                         default=0),
+                "max_rss_bytes": get_peak_memory_usage()}
+
+    def log_memory_report(self) -> None:
+
+        memory_report = self.get_memory_report()
+        for name, stage_memory in memory_report["stages"].items():
+            logger.info(f"- memory of stage '{name}': {_format_bytes(stage_memory['allocated_bytes'])} allocated, "
+                        f"peak {_format_bytes(stage_memory['peak_bytes'])}")
+            for allocation in stage_memory["top_allocations"]:
+                logger.info(f"  {_format_bytes(allocation['bytes'])} in {allocation['blocks']} blocks "
+                            f"allocated at {allocation['site']}")
+        if memory_report["max_rss_bytes"] is not None:
+            logger.info(f"- peak memory of the process: {_format_bytes(memory_report['max_rss_bytes'])}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        metrics = {"seconds": dict(self.__stage_seconds), "total_seconds": sum(self.__stage_seconds.values()),
+                   "counters": dict(self.__counters)}
+        if self.__stage_memory:
+            metrics["memory"] = self.get_memory_report()
+        return metrics
+
+    def write_json(self, filename: str) -> None:
+        import json  # deferred: only needed for the metrics file
+
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+    def reset(self) -> None:
+        self.__stage_seconds.clear()
+        self.__counters.clear()
+        self.__stage_memory.clear()
+
+
+class Progress:
+    """Progress of a long loop, logged at most every interval seconds with throughput (and ETA, if total is known)."""
+
+    def __init__(self, description: str, unit: str, interval: float = PROGRESS_INTERVAL) -> None:
+
+        self.__description = description
+        self.__unit = unit
+        self.__interval = interval
+        self.__start = time.monotonic()
+        self.__last_report = self.__start
+
+    def update(self, done: int, total: Optional[int] = None, details: str = "") -> None:
+        """done units of total are processed; total can be an estimation, changing over time."""
+
+        now = time.monotonic()
+        if now - self.__last_report < self.__interval:
+            return
+        self.__last_report = now
+        throughput = done / max(now - self.__start, 1e-9)
+        message = f"- {self.__description}: {done}"
+        if total is not None:
+            message += f"/{total}"
+        message += f" {self.__unit} ({throughput:.1f}/s"
+        if total is not None and throughput > 0:
+            message += f", ETA {_format_seconds((total - done) / throughput)}"
+        message += ")"
+        if details:
+            message += f", {details}"
+        logger.info(message)
+
+
+class MemoryBudgetExceeded(MemoryError):
+
+    def __init__(self, message: str, stage: str) -> None:
+        super().__init__(message)
+        self.stage = stage
+
+
+class MemoryBudget:
+    """
+    Limit of the memory (resident set size) of the process. check() is cheap enough for inner loops:
+    the memory is only measured every MEMORY_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+
+        self.max_bytes = max_bytes
+        self.__last_check = 0.0
+
+    def check(self, stage: str) -> None:
+        """Raise MemoryBudgetExceeded if the process uses more memory than the budget."""
+
+        if self.max_bytes is None:
+            return
+        now = time.monotonic()
+        if now - self.__last_check < MEMORY_CHECK_INTERVAL:
+            return
+        self.__last_check = now
+        memory_usage = get_memory_usage()
+        if memory_usage is not None and memory_usage > self.max_bytes:
+            raise MemoryBudgetExceeded(f"Memory budget of {_format_bytes(self.max_bytes)} exceeded "
+                                       f"({_format_bytes(memory_usage)}) in stage '{stage}'.", stage)
+
+
+def get_memory_usage() -> Optional[int]:
+    """Current resident set size of the process in bytes (Linux), else its peak, or None if not available."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return get_peak_memory_usage()
+
+
+def get_peak_memory_usage() -> Optional[int]:
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024  # bytes on macOS, kilobytes on Linux
+
+
+def _take_snapshot() -> "tracemalloc.Snapshot":
+    """Snapshot of the traced allocations, without the ones of the measurement itself (e.g. former snapshots)."""
+    import tracemalloc
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                                      tracemalloc.Filter(False, __file__)])
+
+
+def _format_bytes(byte_number: int) -> str:
+    if abs(byte_number) < 1 << 20:
+        return f"{byte_number / (1 << 10):.1f} KB"
+    return f"{byte_number / (1 << 20):.1f} MB"
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(max(seconds, 0)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+METRICS = Metrics()
+MEMORY_BUDGET = MemoryBudget()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3.8
+
+"""
+Pruning of huge graphs for exploratory runs: the rare words and transitions (token bigrams) are dropped,
+or only the most frequent words, or only the neighbourhood of some words are kept.
+
+The pruning works on the word and transition counts (see count_words()), before anything is built:
+the automaton counts are filtered before writing, and for the paraphrase graph, the sentences are cut
+at the dropped words and transitions before the initial graph is built (see prune_sentences()), thus
+the dropped material is never materialized as tokens and nodes, nor merged, nor written.
+"""
+
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+WordCounts = Dict[str, int]
+TransitionCounts = Dict[Tuple[str, str], int]
+
+
+class Pruning:
+    """
+    Pruning options; a word is kept if it passes all of them:
+    - it occurs at least min_node_count times;
+    - it is reachable from one of the neighbourhood words within neighbourhood_radius kept transitions
+      (in either direction), if neighbourhood words are given;
+    - it is one of the top_k_nodes most frequent of these words (the first occurring on ties), if given.
+    A transition is kept if it occurs at least min_edge_count times between two kept words.
+    """
+
+    def __init__(self, min_node_count: int = 1, min_edge_count: int = 1, top_k_nodes: Optional[int] = None,
+                 neighbourhood_words: Sequence[str] = (), neighbourhood_radius: int = 1) -> None:
+
+        assert top_k_nodes is None or top_k_nodes >= 0, f"Invalid number of top nodes: {top_k_nodes}"
+        assert neighbourhood_radius >= 0, f"Invalid neighbourhood radius: {neighbourhood_radius}"
+        self.min_node_count = min_node_count
+        self.min_edge_count = min_edge_count
+        self.top_k_nodes = top_k_nodes
+        self.neighbourhood_words = tuple(neighbourhood_words)
+        self.neighbourhood_radius = neighbourhood_radius
+
+    @classmethod
+    def from_arguments(cls, args: argparse.Namespace) -> "Pruning":
+        return cls(args.min_node_count, args.min_edge_count, args.top_k_nodes, args.neighbourhood or (),
+                   args.neighbourhood_radius)
+
+    @property
+    def is_active(self) -> bool:
+        return (self.min_node_count > 1 or self.min_edge_count > 1 or self.top_k_nodes is not None
+                or bool(self.neighbourhood_words))
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        return (f"Pruning(min_node_count={self.min_node_count}, min_edge_count={self.min_edge_count}, "
+                f"top_k_nodes={self.top_k_nodes}, neighbourhood_words={list(self.neighbourhood_words)}, "
+                f"neighbourhood_radius={self.neighbourhood_radius})")
+
+
+def count_words(tokenized_sentences: Iterable[List[str]]) -> Tuple[WordCounts, TransitionCounts]:
+    """Occurrence counts of the words and transitions of the (streamed) sentences, in the order of first occurrence."""
+
+    word_counts = {}  # type: WordCounts
+    transition_counts = {}  # type: TransitionCounts
+    for tokens in tokenized_sentences:
+        for token in tokens:
+            word_counts[token] = word_counts.get(token, 0) + 1
+        for transition in zip(tokens, tokens[1:]):
+            transition_counts[transition] = transition_counts.get(transition, 0) + 1
+    return word_counts, transition_counts
+
+
+def prune_counts(word_counts: WordCounts, transition_counts: TransitionCounts,
+                 pruning: Pruning) -> Tuple[WordCounts, TransitionCounts]:
+    """The counts of the kept words and transitions (see Pruning), in their order."""
+
+    kept_words = {word for word, count in word_counts.items() if count >= pruning.min_node_count}
+    if pruning.neighbourhood_words:
+        kept_words = _get_neighbourhood(kept_words, transition_counts, pruning)
+    if pruning.top_k_nodes is not None and len(kept_words) > pruning.top_k_nodes:
+        import heapq  # deferred: only needed for the top-k pruning
+        word_positions = {word: position for position, word in enumerate(word_counts)}
+        kept_words = set(heapq.nsmallest(pruning.top_k_nodes, kept_words,
+                                         key=lambda word: (-word_counts[word], word_positions[word])))
+
+    kept_word_counts = {word: count for word, count in word_counts.items() if word in kept_words}
+    kept_transition_counts = {(word_i, word_j): count for (word_i, word_j), count in transition_counts.items()
+                              if count >= pruning.min_edge_count and word_i in kept_words and word_j in kept_words}
+    return kept_word_counts, kept_transition_counts
+
+
+def _get_neighbourhood(words: Set[str], transition_counts: TransitionCounts, pruning: Pruning) -> Set[str]:
+    """The words within the neighbourhood radius of the neighbourhood words (breadth-first, over kept transitions)."""
+
+    neighbours = {}  # type: Dict[str, List[str]]
+    for (word_i, word_j), count in transition_counts.items():
+        if count >= pruning.min_edge_count and word_i in words and word_j in words:
+            neighbours.setdefault(word_i, []).append(word_j)
+            neighbours.setdefault(word_j, []).append(word_i)
+
+    neighbourhood = {word for word in pruning.neighbourhood_words if word in words}
+    frontier = list(neighbourhood)
+    for _ in range(pruning.neighbourhood_radius):
+        next_frontier = []
+        for word in frontier:
+            for neighbour in neighbours.get(word, ()):
+                if neighbour not in neighbourhood:
+                    neighbourhood.add(neighbour)
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+    return neighbourhood
+
+
+def prune_sentences(tokenized_sentences: Iterable[List[str]], kept_word_counts: WordCounts,
+                    kept_transition_counts: TransitionCounts) -> Iterator[List[str]]:
+    """
+    Yield the parts of the (streamed) sentences made of kept words and transitions: the sentences are cut
+    at the dropped words and transitions, each part is a sentence of its own (thus its first and last words
+    are marked as start and end in the graph).
+    """
+
+    for tokens in tokenized_sentences:
+        part = []
+        for token in tokens:
+            if token not in kept_word_counts:
+                if part:
+                    yield part
+                part = []
+                continue
+            if part and (part[-1], token) not in kept_transition_counts:
+                yield part
+                part = []
+            part.append(token)
+        if part:
+            yield part
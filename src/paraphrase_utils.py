@@ -8,19 +8,84 @@ Util collection for the paraphrase_graphml_builder.py script.
 __author__ = "Eva Mujdricza-Maydt"
 __version__ = "20200410"
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, ContextManager, TextIO, Tuple
+from array import array
 from enum import Enum
+import contextlib
+import itertools
 import os
-import yaml
+import re
+import sys
 
 from paraphrase_Node import Node
-from paraphrase_Token import Token
+from paraphrase_Graph import Graph
 
 
-def get_config(config_fn: str) -> Dict:
+STDIN_FILENAME = "-"
+DEFAULT_INPUT_PATTERN = "*.txt"  # input files in an input directory
+GLOB_PATTERN = re.compile(r"[*?[]")
+WRITE_BUFFER_SIZE = 1 << 20  # characters
+GZIP_LEVEL = 6  # as zlib: much faster than the gzip default 9, for a slightly larger output
+
+
+DEFAULT_CONFIG_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.yaml")
+CONFIG_LINE_PATTERN = re.compile(r"""^\s*([A-Za-z_][A-Za-z0-9_]*)\s*:\s+"""  # key
+                                 r"""(?:"((?:[^"\\]|\\.)*)"|'((?:[^']|'')*)'|([^\s#].*?))"""  # value
+                                 r"""(?:\s+#.*)?\s*$""")  # comment
+CONFIG_PLAIN_PATTERN = re.compile(r"^(?:[-+]?(?:0|[1-9][0-9]*)|[A-Za-z][A-Za-z0-9 ._/-]*)$")
+YAML_SPECIAL_WORDS = {"true", "false", "yes", "no", "on", "off", "y", "n", "null", "nan", "inf"}
+
+
+def get_config(config_fn: Optional[str] = None) -> Dict:
+    """
+    Config of the file, completed with the built-in defaults (DEFAULT_CONFIG). Without file, the config.yaml
+    next to the scripts is read if it exists, else the defaults are used.
+    Flat configs of "KEY: value" lines (as config.yaml) are read without yaml, which is only imported
+    for other configs.
+    """
+
+    if config_fn is None:
+        if not os.path.exists(DEFAULT_CONFIG_FILENAME):
+            return dict(DEFAULT_CONFIG)
+        config_fn = DEFAULT_CONFIG_FILENAME
     assert os.path.exists(config_fn), f"Config file '{config_fn}' not available."
     with open(config_fn) as f:
-        return yaml.load(stream=f, Loader=yaml.Loader)
+        config_text = f.read()
+    try:
+        config = _parse_flat_config(config_text)
+    except ValueError:
+        import yaml  # slow import, only if needed
+        config = yaml.load(stream=config_text, Loader=yaml.Loader)
+    return dict(DEFAULT_CONFIG, **config)
+
+
+def _parse_flat_config(config_text: str) -> Dict[str, Any]:
+    """
+    Parse a config of "KEY: value" lines (and comments) as yaml does; values: quoted strings, integers and
+    plain words. Raise ValueError for anything else (to be parsed by yaml).
+    """
+
+    config = {}
+    for line in config_text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        match = CONFIG_LINE_PATTERN.match(line)
+        if match is None:
+            raise ValueError(f"Not a flat config line: {line}")
+        key, double_quoted, single_quoted, plain = match.groups()
+        if double_quoted is not None:
+            import json  # deferred: only needed for double-quoted values
+            value = json.loads(f'"{double_quoted}"')  # the json escapes are a subset of the yaml ones
+        elif single_quoted is not None:
+            value = single_quoted.replace("''", "'")
+        elif CONFIG_PLAIN_PATTERN.match(plain) and plain.lower() not in YAML_SPECIAL_WORDS:
+            value = int(plain) if plain[-1].isdigit() and plain.lstrip("+-").isdigit() else plain
+        else:
+            raise ValueError(f"Not a flat config value: {plain}")
+        if key in config:
+            raise ValueError(f"Repeated config key: {key}")
+        config[key] = value
+    return config
 
 
 class FORMAT(Enum):
@@ -36,6 +101,16 @@ class FORMAT(Enum):
     CHARACTER_WIDTH = "CHARACTER_WIDTH"
 
 
+DEFAULT_CONFIG = {  # as in config.yaml
+    FORMAT.START_TOKEN.value: "@@@START@@@",
+    FORMAT.END_TOKEN.value: "@@@END@@@",
+    FORMAT.COLOR_GENERAL.value: "#FFFFFF",
+    FORMAT.COLOR_START.value: "#FFFF99",
+    FORMAT.COLOR_END.value: "#CCFFFF",
+    FORMAT.NL.value: "\n",
+    FORMAT.CHARACTER_WIDTH.value: 8,
+}
+
 
 class GRAPHML(Enum):
     HEADER = """<?xml version="1.0" encoding="UTF-8"?>"""
@@ -48,10 +123,12 @@ class GRAPHML(Enum):
 <!-- keys for graph -->
 
 <!-- keys for node -->
+<key attr.name="count" attr.type="int" for="node" id="node_count"/>
 
 <!-- keys for port -->
 
 <!-- keys for edge -->
+<key attr.name="count" attr.type="int" for="edge" id="edge_count"/>
 """
 
     GRAPHML_END = "</graphml>"
@@ -79,37 +156,164 @@ class GRAPHML(Enum):
 </edge>
 """ # id, from, to
 
+    NODE_COUNT_STRF = """      <data key="node_count">{}</data>
+"""  # count (before </node>)
+    EDGE_COUNT_STRF = """      <data key="edge_count">{}</data>
+"""  # count (before </edge>)
 
 
+class LEAN_GRAPHML(Enum):
+    """Lean graphml (see LeanGraphmlWriter): the styling is given once, as the defaults of the (short) keys."""
+    GRAPHML_START_STRF = """<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+<key attr.name="label" attr.type="string" for="node" id="l"/>
+<key attr.name="color" attr.type="string" for="node" id="c"><default>{}</default></key>
+<key attr.name="end" attr.type="boolean" for="node" id="e"><default>false</default></key>
+<key attr.name="count" attr.type="int" for="node" id="nc"/>
+<key attr.name="count" attr.type="int" for="edge" id="ec"/>
+"""  # general color
 
-def read_sentences(filename: str, config, add_start_and_end_points:bool) -> List[str]:
+    LABEL_STRF = """<data key="l">{}</data>"""
+    COLOR_STRF = """<data key="c">{}</data>"""
+    END = """<data key="e">true</data>"""
+    NODE_COUNT_STRF = """<data key="nc">{}</data>"""
+    EDGE_COUNT_STRF = """<data key="ec">{}</data>"""
 
-    with open(filename) as f:
-        sentences = [line.strip() for line in f.readlines() if line.strip()]
-    
-    tokenized_sentences = []
-    for sentence in sentences:
-        tokenized_sentence = sentence.split()
+
+
+
+def iter_sentences(filename: str, config, add_start_and_end_points:bool) -> Iterator[List[str]]:
+    """
+    Yield the tokenized sentences of the input file one by one (empty lines are skipped).
+    With the filename '-', the sentences are read from the standard input.
+    """
+
+    with _open_input(filename) as f:
+        yield from tokenize_lines(f, config, add_start_and_end_points)
+
+
+def iter_sentences_in_byte_range(filename: str, config, add_start_and_end_points:bool,
+                                 start: int, end: int) -> Iterator[List[str]]:
+    """
+    Yield the tokenized sentences of the lines starting in the byte range [start, end) of the input file
+    (see get_byte_range_shards()).
+    """
+
+    import locale  # deferred: only needed for the workers
+    encoding = locale.getpreferredencoding(False)  # as for the files opened in text mode
+
+    def iter_lines(f):
+        position = start
+        for line in f:
+            if position >= end:
+                return
+            position += len(line)
+            yield line.decode(encoding)
+
+    with open(filename, "rb") as f:
+        f.seek(start)
+        yield from tokenize_lines(iter_lines(f), config, add_start_and_end_points)
+
+
+def get_byte_range_shards(filename: str, shard_number: int) -> List[Tuple[int, int]]:
+    """Split the input file in (at most) shard_number byte ranges [start, end) of about the same size at line ends."""
+
+    file_size = os.path.getsize(filename)
+    boundaries = [0]
+    with open(filename, "rb") as f:
+        for shard_idx in range(1, shard_number):
+            f.seek(max(file_size * shard_idx // shard_number - 1, boundaries[-1]))
+            f.readline()  # to the start of the next line
+            boundary = min(f.tell(), file_size)
+            if boundary > boundaries[-1]:
+                boundaries.append(boundary)
+    if file_size > boundaries[-1]:
+        boundaries.append(file_size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def tokenize_lines(lines: Iterable[str], config, add_start_and_end_points:bool) -> Iterator[List[str]]:
+    """Yield the tokenized sentences of the lines (as in an input file; empty lines are skipped)."""
+
+    start_token = config[FORMAT.START_TOKEN.value]
+    end_token = config[FORMAT.END_TOKEN.value]
+
+    for line in lines:
+        tokenized_sentence = line.split()
+        if not tokenized_sentence:
+            continue
         if add_start_and_end_points:
-            
-            start_token = config[FORMAT.START_TOKEN.value]
             tokenized_sentence.insert(0, start_token)
-            end_token = config[FORMAT.END_TOKEN.value]
             tokenized_sentence.append(end_token)
-        tokenized_sentences.append(tokenized_sentence)
-    
-    return tokenized_sentences
+        yield tokenized_sentence
+
+
+def iter_sentence_chunks(sentences: Iterable[List[str]], chunk_size: int) -> Iterator[List[List[str]]]:
+    """Group the (streamed) sentences to lists of at most chunk_size sentences."""
+
+    sentence_iterator = iter(sentences)
+    while True:
+        chunk = list(itertools.islice(sentence_iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_sentences(filename: str, config, add_start_and_end_points:bool) -> List[List[str]]:
+
+    return list(iter_sentences(filename, config, add_start_and_end_points))
+
+
+def _open_input(filename: str) -> ContextManager[TextIO]:
+    if filename == STDIN_FILENAME:
+        return contextlib.nullcontext(sys.stdin)
+    return open(filename)
+
+
+def get_output_filename(input_filename: str, output_dir: Optional[str], end_points: bool, suffix: str) -> str:
+    """
+    Output file in the output directory (default: the folder of the input file) named after the input file,
+    e.g. 'input_we_prp.graphml' for the input file 'input.txt' with end points and the suffix '_prp.graphml'.
+    For the standard input, the default folder is the current one and the name is 'stdin'.
+    """
+
+    if input_filename == STDIN_FILENAME:
+        input_filename = os.path.join(os.getcwd(), "stdin")
+    output_dir = output_dir if output_dir else os.path.dirname(os.path.realpath(input_filename))
+    os.makedirs(output_dir, exist_ok=True)
+    ep = "_we" if end_points else ""
+    return os.path.join(output_dir, os.path.splitext(os.path.basename(input_filename))[0] + ep + suffix)
     
 
+def expand_input_filenames(inputs: Iterable[str], pattern: str = DEFAULT_INPUT_PATTERN) -> List[str]:
+    """
+    Input files of the given inputs: a directory stands for its files matching the pattern (sorted),
+    a glob pattern for its matching files (sorted), anything else (e.g. '-' for the standard input) for itself.
+    """
+
+    import glob  # deferred: not needed at start-up
+
+    input_filenames = []
+    for input_item in inputs:
+        if input_item != STDIN_FILENAME and os.path.isdir(input_item):
+            input_filenames.extend(sorted(filename for filename in glob.glob(os.path.join(input_item, pattern))
+                                          if os.path.isfile(filename)))
+        elif GLOB_PATTERN.search(input_item):
+            input_filenames.extend(sorted(filename for filename in glob.glob(input_item) if os.path.isfile(filename)))
+        else:
+            input_filenames.append(input_item)
+    return input_filenames
+
+
+XML_ESCAPES = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&apos;"}
+XML_ESCAPE_PATTERN = re.compile("[&<>\"']")
+
+
 def escape_text(token):
-    """In xml, some characters are not allowed for a text node. Escape them."""
+    """In xml, some characters are not allowed for a text node. Escape them (in a single pass)."""
     
-    token = token.replace("&", "&amp;")
-    token = token.replace("<", "&lt;")
-    token = token.replace(">", "&gt;")
-    token = token.replace('"', "&quot;")
-    token = token.replace("'", "&apos;")
-    return token
+    if XML_ESCAPE_PATTERN.search(token) is None:
+        return token
+    return XML_ESCAPE_PATTERN.sub(lambda match: XML_ESCAPES[match.group()], token)
 
 
 def _get_width(token:str, config:Dict[str, Any]) -> float:
@@ -142,59 +346,386 @@ def _get_double_frame(node:Node) -> str:
     return ''
 
 
-def _format_node(node_obj, config:Dict[str, Any]):
-    token_word = node_obj.token_word
-    escaped_token_word = escape_text(token_word)
-    escaped_node_id = escape_text(node_obj.node_id)
-    
-    return GRAPHML.NODE_STRF.value.format(
-        escaped_node_id,
-        _get_width(token_word, config),
-        _get_background_color(node_obj, config),
-        _get_double_frame(node_obj),
-        escaped_token_word
-    )
+def open_output_file(filename: str) -> TextIO:
+    """
+    Text file for writing, compressed while writing if the filename ends with '.gz' (gzip) or '.xz' (xz).
+    """
 
+    extension = os.path.splitext(filename)[1]
+    if extension == ".gz":
+        import gzip  # deferred: only needed for compressed outputs
+        return gzip.open(filename, "wt", compresslevel=GZIP_LEVEL)
+    if extension == ".xz":
+        import lzma
+        return lzma.open(filename, "wt")
+    return open(filename, "w")
+
+
+class GraphWriter:
+    """
+    Buffered writer of a graph output format, shared by the builders (see the subclasses for the formats).
+
+    The elements are collected in a buffer and written in large chunks. The node and edge ids have to be escaped
+    by the caller (e.g. with escape()); the nodes have to be written before the edges between them.
+
+    With output_file (an open text file, e.g. io.StringIO), the graph is written there instead of to the file
+    output_filename (compressed for '.gz' and '.xz', see open_output_file()), which is then only the graph id.
 
-def _format_edge(source_node_id, target_node_id):
-    
-    escaped_sni = escape_text(source_node_id)
-    escaped_tni = escape_text(target_node_id)
-    return GRAPHML.EDGE_STRF.value.format(
-        f"id_{escaped_sni}_{escaped_tni}_edge",
-        escaped_sni,
-        escaped_tni
-    )
+    Usage:
+        with GraphmlWriter(output_filename, config) as writer:
+            writer.write_node(escaped_node_id, token_word, background_color, double_frame)
+            writer.write_edge(escaped_source_node_id, escaped_target_node_id)
+    """
+
+    EXTENSION = ""
+
+    def __init__(self, output_filename: str, config:Dict[str, Any], buffer_size:int=WRITE_BUFFER_SIZE,
+                 output_file:Optional[TextIO]=None) -> None:
+
+        self._output_filename = output_filename
+        self._config = config
+        self.__buffer_size = buffer_size
+        self.__buffer = []
+        self.__buffered_size = 0
+        self.__escaped_texts = {}
+        self.__output_file = output_file
+        self.__file = None
+
+    def __enter__(self) -> "GraphWriter":
+
+        if self.__output_file is None:
+            self.__file = open_output_file(self._output_filename)
+        else:
+            self.__file = self.__output_file
+        self._write(self._get_header())
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+
+        try:
+            if exc_type is None:
+                self._write(self._get_footer())
+                self.flush()
+        finally:
+            if self.__output_file is None:
+                self.__file.close()
+
+    def escape(self, text: str) -> str:
+        """Escaped text, cached: use it for texts which occur repeatedly (e.g. token words)."""
+        escaped_text = self.__escaped_texts.get(text)
+        if escaped_text is None:
+            escaped_text = self.__escaped_texts[text] = escape_text(text)
+        return escaped_text
+
+    def write_node(self, escaped_node_id: str, token_word: str, background_color: str, double_frame: str,
+                   count: Optional[int] = None) -> None:
+        """With count, the number of occurrences is written as node data."""
+        raise NotImplementedError
+
+    def write_edge(self, escaped_source_node_id: str, escaped_target_node_id: str,
+                   edge_id: Optional[str] = None, count: Optional[int] = None) -> None:
+        """With count, the number of occurrences is written as edge data."""
+        raise NotImplementedError
+
+    def _get_header(self) -> str:
+        raise NotImplementedError
+
+    def _get_footer(self) -> str:
+        raise NotImplementedError
+
+    def _write(self, text: str) -> None:
+
+        self.__buffer.append(text)
+        self.__buffered_size += len(text)
+        if self.__buffered_size >= self.__buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+
+        self.__file.write("".join(self.__buffer))
+        self.__buffer = []
+        self.__buffered_size = 0
+
+
+class GraphmlWriter(GraphWriter):
+    """
+    Graphml with the yEd styling of each node and edge (the default output).
+
+    The formatted node strings (everything after the node id, including the node width) are cached per
+    distinct token word, background color and frame, thus they are computed only once per word.
+    """
+
+    EXTENSION = ".graphml"
+    NODE_PREFIX, NODE_TAIL_STRF = GRAPHML.NODE_STRF.value.split("{}", 1)  # the node id is the first field
+    NODE_TAIL_STRF, NODE_END = NODE_TAIL_STRF.rsplit("</node>", 1)  # the node count comes before </node>
+    NODE_END = "</node>" + NODE_END + os.linesep
+    EDGE_PARTS = GRAPHML.EDGE_STRF.value.split("{}")  # around edge id, source and target
+    EDGE_PARTS[3], EDGE_END = EDGE_PARTS[3].rsplit("</edge>", 1)  # the edge count comes before </edge>
+    EDGE_END = "</edge>" + EDGE_END + os.linesep
+
+    def __init__(self, graphml_output_filename: str, config:Dict[str, Any], buffer_size:int=WRITE_BUFFER_SIZE,
+                 output_file:Optional[TextIO]=None) -> None:
+
+        super().__init__(graphml_output_filename, config, buffer_size, output_file)
+        self.__node_tails = {}
+
+    def _get_header(self) -> str:
+        return (GRAPHML.HEADER.value + os.linesep
+                + GRAPHML.GRAPHML_START.value + os.linesep
+                + GRAPHML.GRAPH_START_STRF.value.format(escape_text(self._output_filename)) + os.linesep)
+
+    def _get_footer(self) -> str:
+        return GRAPHML.GRAPH_END.value + os.linesep + GRAPHML.GRAPHML_END.value
+
+    def write_node(self, escaped_node_id: str, token_word: str, background_color: str, double_frame: str,
+                   count: Optional[int] = None) -> None:
+
+        node_key = (token_word, background_color, double_frame)
+        node_tail = self.__node_tails.get(node_key)
+        if node_tail is None:
+            node_tail = self.__node_tails[node_key] = self.NODE_TAIL_STRF.format(
+                _get_width(token_word, self._config),
+                background_color,
+                double_frame,
+                self.escape(token_word)
+            )
+        if count is None:
+            self._write(self.NODE_PREFIX + escaped_node_id + node_tail + self.NODE_END)
+        else:
+            self._write(self.NODE_PREFIX + escaped_node_id + node_tail
+                        + GRAPHML.NODE_COUNT_STRF.value.format(count) + self.NODE_END)
+
+    def write_edge(self, escaped_source_node_id: str, escaped_target_node_id: str,
+                   edge_id: Optional[str] = None, count: Optional[int] = None) -> None:
+        """Without edge id, the id is built from the source and target node ids."""
+
+        if edge_id is None:
+            edge_id = f"id_{escaped_source_node_id}_{escaped_target_node_id}_edge"
+        parts = self.EDGE_PARTS
+        count_data = "" if count is None else GRAPHML.EDGE_COUNT_STRF.value.format(count)
+        self._write(f"{parts[0]}{edge_id}{parts[1]}{escaped_source_node_id}{parts[2]}{escaped_target_node_id}"
+                    f"{parts[3]}{count_data}{self.EDGE_END}")
+
+
+class _NumberedGraphWriter(GraphWriter):
+    """
+    Base of the lean formats: the nodes get short numeric ids (in the order of writing), the edge ids are dropped,
+    and the styling is reduced to the node label, the background color (only if it is not the general one)
+    and the end flag (for the double frame). The formatted node strings are cached as in GraphmlWriter.
+    """
+
+    def __init__(self, output_filename: str, config:Dict[str, Any], buffer_size:int=WRITE_BUFFER_SIZE,
+                 output_file:Optional[TextIO]=None) -> None:
+
+        super().__init__(output_filename, config, buffer_size, output_file)
+        self.__node_numbers = {}  # type: Dict[str, int]
+        self.__node_tails = {}
+
+    def write_node(self, escaped_node_id: str, token_word: str, background_color: str, double_frame: str,
+                   count: Optional[int] = None) -> None:
+
+        node_number = self.__node_numbers[escaped_node_id] = len(self.__node_numbers)
+        node_key = (token_word, background_color, double_frame)
+        node_tail = self.__node_tails.get(node_key)
+        if node_tail is None:
+            color = None if background_color == self._config[FORMAT.COLOR_GENERAL.value] else background_color
+            node_tail = self.__node_tails[node_key] = self._format_node_tail(token_word, color, bool(double_frame))
+        self._write(self._format_node(node_number, node_tail, count))
+
+    def write_edge(self, escaped_source_node_id: str, escaped_target_node_id: str,
+                   edge_id: Optional[str] = None, count: Optional[int] = None) -> None:
+        """The edge id is ignored."""
+        self._write(self._format_edge(self.__node_numbers[escaped_source_node_id],
+                                      self.__node_numbers[escaped_target_node_id], count))
+
+    def _format_node_tail(self, token_word: str, color: Optional[str], is_end: bool) -> str:
+        raise NotImplementedError
+
+    def _format_node(self, node_number: int, node_tail: str, count: Optional[int]) -> str:
+        raise NotImplementedError
+
+    def _format_edge(self, source_node_number: int, target_node_number: int, count: Optional[int]) -> str:
+        raise NotImplementedError
+
+
+class LeanGraphmlWriter(_NumberedGraphWriter):
+    """
+    Plain graphml without yEd styling: node ids 'n0', 'n1', ..., and the label, color, end flag and count
+    as node data, the color and the end flag only if they differ from the key defaults.
+    In yEd, the data can be mapped to the node styles with the properties mapper.
+    The files are named '*.lean.graphml', not to overwrite the styled graphml of the same input.
+    """
+
+    EXTENSION = ".lean.graphml"
+
+    def _get_header(self) -> str:
+        return (GRAPHML.HEADER.value + os.linesep
+                + LEAN_GRAPHML.GRAPHML_START_STRF.value.format(escape_text(self._config[FORMAT.COLOR_GENERAL.value]))
+                + GRAPHML.GRAPH_START_STRF.value.format(escape_text(self._output_filename)) + os.linesep)
+
+    def _get_footer(self) -> str:
+        return GRAPHML.GRAPH_END.value + os.linesep + GRAPHML.GRAPHML_END.value + os.linesep
+
+    def _format_node_tail(self, token_word: str, color: Optional[str], is_end: bool) -> str:
+        return (LEAN_GRAPHML.LABEL_STRF.value.format(self.escape(token_word))
+                + ("" if color is None else LEAN_GRAPHML.COLOR_STRF.value.format(escape_text(color)))
+                + (LEAN_GRAPHML.END.value if is_end else ""))
+
+    def _format_node(self, node_number: int, node_tail: str, count: Optional[int]) -> str:
+        count_data = "" if count is None else LEAN_GRAPHML.NODE_COUNT_STRF.value.format(count)
+        return f'<node id="n{node_number}">{node_tail}{count_data}</node>\n'
+
+    def _format_edge(self, source_node_number: int, target_node_number: int, count: Optional[int]) -> str:
+        if count is None:
+            return f'<edge source="n{source_node_number}" target="n{target_node_number}"/>\n'
+        return (f'<edge source="n{source_node_number}" target="n{target_node_number}">'
+                f'{LEAN_GRAPHML.EDGE_COUNT_STRF.value.format(count)}</edge>\n')
+
+
+class JsonGraphWriter(_NumberedGraphWriter):
+    """
+    Compact JSON, one element per line:
+      {"graph": <id>, "nodes": [{"id": 0, "label": "a", "color": "#FFFF99", "end": true, "count": 2}, ...],
+       "edges": [[0, 1], [0, 2, 5], ...]}
+    The color, end flag and counts only if given (see LeanGraphmlWriter); an edge is [source, target(, count)].
+    """
+
+    EXTENSION = ".json"
+
+    def __init__(self, output_filename: str, config:Dict[str, Any], buffer_size:int=WRITE_BUFFER_SIZE,
+                 output_file:Optional[TextIO]=None) -> None:
+
+        import json  # deferred: only needed for the json output
+
+        super().__init__(output_filename, config, buffer_size, output_file)
+        self.__dumps = json.dumps
+        self.__separator = "\n"
+        self.__is_writing_edges = False
+
+    def _get_header(self) -> str:
+        return '{"graph":' + self.__dumps(self._output_filename, ensure_ascii=False) + ',"nodes":['
+
+    def _get_footer(self) -> str:
+        return ("" if self.__is_writing_edges else '\n],"edges":[') + "\n]}\n"
+
+    def _format_node_tail(self, token_word: str, color: Optional[str], is_end: bool) -> str:
+        return (',"label":' + self.__dumps(token_word, ensure_ascii=False)
+                + ("" if color is None else ',"color":' + self.__dumps(color))
+                + (',"end":true' if is_end else ""))
 
+    def _format_node(self, node_number: int, node_tail: str, count: Optional[int]) -> str:
+        separator, self.__separator = self.__separator, ",\n"
+        count_data = "" if count is None else f',"count":{count}'
+        return f'{separator}{{"id":{node_number}{node_tail}{count_data}}}'
 
-def write_graphml(node_dict: Dict[str, Node], config:Dict[str, Any], graphml_output_filename: str) -> None:
+    def _format_edge(self, source_node_number: int, target_node_number: int, count: Optional[int]) -> str:
+        if not self.__is_writing_edges:
+            self.__is_writing_edges = True
+            self.__separator = '\n],"edges":[\n'
+        separator, self.__separator = self.__separator, ",\n"
+        count_data = "" if count is None else f",{count}"
+        return f"{separator}[{source_node_number},{target_node_number}{count_data}]"
+
+
+class DotGraphWriter(_NumberedGraphWriter):
+    """
+    Graphviz DOT: node ids 'n0', 'n1', ..., the node styling as default attributes, the color (fillcolor),
+    the end flag (peripheries=2, i.e. a double frame) and the counts (count attributes) only if given.
+    """
+
+    EXTENSION = ".dot"
+
+    def _get_header(self) -> str:
+        return (f"digraph {_quote_dot(self._output_filename)} {{\n"
+                f"node [shape=box, style=\"rounded,filled\", fontname=\"Consolas\", fontsize=12, "
+                f"fillcolor={_quote_dot(self._config[FORMAT.COLOR_GENERAL.value])}];\n")
+
+    def _get_footer(self) -> str:
+        return "}\n"
+
+    def _format_node_tail(self, token_word: str, color: Optional[str], is_end: bool) -> str:
+        return (f"label={_quote_dot(token_word)}"
+                + ("" if color is None else f", fillcolor={_quote_dot(color)}")
+                + (", peripheries=2" if is_end else ""))
+
+    def _format_node(self, node_number: int, node_tail: str, count: Optional[int]) -> str:
+        count_data = "" if count is None else f", count={count}"
+        return f"n{node_number} [{node_tail}{count_data}];\n"
+
+    def _format_edge(self, source_node_number: int, target_node_number: int, count: Optional[int]) -> str:
+        if count is None:
+            return f"n{source_node_number} -> n{target_node_number};\n"
+        return f"n{source_node_number} -> n{target_node_number} [count={count}];\n"
+
+
+def _quote_dot(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+OUTPUT_FORMATS = {"graphml": GraphmlWriter, "lean": LeanGraphmlWriter, "json": JsonGraphWriter, "dot": DotGraphWriter}
+COMPRESSIONS = ("gz", "xz")
+
+
+def get_output_suffix(output_format: str = "graphml", compression: Optional[str] = None) -> str:
+    """File extension of the output format, e.g. '.graphml', or '.graphml.gz' with the compression 'gz'."""
+    return OUTPUT_FORMATS[output_format].EXTENSION + ("" if compression is None else "." + compression)
+
+
+def write_graphml(node_dict: Graph, config:Dict[str, Any], graphml_output_filename: str,
+                  output_file:Optional[TextIO]=None, output_format:str="graphml") -> None:
+    """
+    The graph in the output format (see OUTPUT_FORMATS), by default as graphml. The nodes and edges are written
+    with their number of occurrences in the input sentences (duplicate sentences included, see Graph).
+    """
     
-    with open(graphml_output_filename, "w") as f:
-        f.write(GRAPHML.HEADER.value)
-        f.write(os.linesep)
-        f.write(GRAPHML.GRAPHML_START.value)
-        f.write(os.linesep)
-        f.write(GRAPHML.GRAPH_START_STRF.value.format(graphml_output_filename))
-        f.write(os.linesep)
+    escaped_node_names = {}
+    edge_counts = _get_edge_counts(node_dict)
+    with OUTPUT_FORMATS[output_format](graphml_output_filename, config, output_file=output_file) as writer:
 
         # nodes
-        node_ids = set(node_dict.keys())
         for node_id, node_obj in node_dict.items():
-            f.write(_format_node(node_obj, config))
-            f.write(os.linesep)
+            escaped_node_name = escaped_node_names[node_id] = escape_text(node_dict.get_node_name(node_obj))
+            writer.write_node(escaped_node_name, node_obj.token_word,
+                              _get_background_color(node_obj, config), _get_double_frame(node_obj), node_obj.count)
 
         # edges: write only outgoing edges!!!
         for curr_node_id, node_obj in node_dict.items():
 
             for outgoing_node_id in node_obj.outgoing_node_ids:
-                if outgoing_node_id not in node_ids:
+                if outgoing_node_id not in node_dict:
                     nd = '\n'.join([str(item) for id, item in node_dict.items()])
                     msg = f"Outgoing node id '{outgoing_node_id}' requested by node {node_obj} not in the graph!\n{nd}"
                     raise ValueError(msg)
-                f.write(_format_edge(curr_node_id, outgoing_node_id))
-                f.write(os.linesep)
-
-        f.write(GRAPHML.GRAPH_END.value)
-        f.write(os.linesep)
-        f.write(GRAPHML.GRAPHML_END.value)
-
+                writer.write_edge(escaped_node_names[curr_node_id], escaped_node_names[outgoing_node_id],
+                                  count=edge_counts.get((curr_node_id, outgoing_node_id), 0))
+
+
+def _get_edge_counts(node_dict: Graph) -> Dict[Tuple[int, int], int]:
+    """
+    Number of occurrences of the edges: the transitions of the sentences through them, with their multiplicity.
+    The node of each token is looked up in an array of the node ids of the tokens, sentence by sentence
+    (4 bytes per token), which is filled from the token positions of the nodes.
+    """
+
+    sentence_lengths = array("I", bytes(4 * node_dict.sentence_number))
+    for node_obj in node_dict.values():
+        token_positions = node_obj.token_positions
+        for sent_idx, tok_idx in zip(token_positions[0::2], token_positions[1::2]):
+            if tok_idx >= sentence_lengths[sent_idx]:
+                sentence_lengths[sent_idx] = tok_idx + 1
+    sentence_offsets = array("I", [0])
+    for sentence_length in sentence_lengths:
+        sentence_offsets.append(sentence_offsets[-1] + sentence_length)
+    token_node_ids = array("I", bytes(4 * sentence_offsets[-1]))
+    for node_id, node_obj in node_dict.items():
+        token_positions = node_obj.token_positions
+        for sent_idx, tok_idx in zip(token_positions[0::2], token_positions[1::2]):
+            token_node_ids[sentence_offsets[sent_idx] + tok_idx] = node_id
+
+    edge_counts = {}
+    for sent_idx in range(node_dict.sentence_number):
+        sentence_count = node_dict.get_sentence_count(sent_idx)
+        sentence_node_ids = token_node_ids[sentence_offsets[sent_idx]:sentence_offsets[sent_idx + 1]]
+        for edge in zip(sentence_node_ids, sentence_node_ids[1:]):
+            edge_counts[edge] = edge_counts.get(edge, 0) + sentence_count
+    return edge_counts